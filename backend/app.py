@@ -1,4 +1,4 @@
-from flask import Flask, render_template
+from flask import Flask, render_template, jsonify
 from dotenv import load_dotenv
 import os
 import logging
@@ -7,40 +7,75 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Load environment variables
+# Load environment variables (before backend.db reads them)
 load_dotenv()
 
-# Configure app with correct template and static folders
-app = Flask(__name__, 
-           template_folder=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates'),
-           static_folder=os.path.join(os.path.dirname(os.path.dirname(__file__)), 'backend/static'))
-app.secret_key = os.getenv("SECRET_KEY", "dev-secret")
-
-# register blueprints
-from backend.routes import (
-    users,
-    groups,
-    projects,
-    availability_api,
-    schedule,
-    calendar,
-    ics_upload
-)
-
-app.register_blueprint(users.bp)
-app.register_blueprint(groups.bp)
-app.register_blueprint(projects.bp)
-app.register_blueprint(availability_api.bp)
-app.register_blueprint(schedule.bp)
-app.register_blueprint(calendar.bp)
-app.register_blueprint(ics_upload.bp)
-
-# APScheduler / reminders (unchanged from before)
-from apscheduler.schedulers.background import BackgroundScheduler
-from backend.reminder import deadline_reminder_job
-from datetime import datetime
-
-if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+
+
+def create_app():
+    """
+    Build the Flask app. Nothing here touches the database: the engine is
+    created on the first query of each process (see backend.db), so the
+    factory is cheap to call in every worker of a pre-fork server.
+    """
+    # Configure app with correct template and static folders
+    app = Flask(__name__,
+               template_folder=os.path.join(BASE_DIR, 'templates'),
+               static_folder=os.path.join(BASE_DIR, 'backend/static'))
+    app.secret_key = os.getenv("SECRET_KEY", "dev-secret")
+
+    # one database session per request, closed when the app context ends;
+    # requests that wrote open a read-your-writes window for the replica
+    from backend.db import close_db, remember_writes, check_connection
+    app.after_request(remember_writes)
+    app.teardown_appcontext(close_db)
+
+    # register blueprints
+    from backend.routes import (
+        users,
+        groups,
+        projects,
+        availability_api,
+        schedule,
+        calendar,
+        ics_upload
+    )
+
+    app.register_blueprint(users.bp)
+    app.register_blueprint(groups.bp)
+    app.register_blueprint(projects.bp)
+    app.register_blueprint(availability_api.bp)
+    app.register_blueprint(schedule.bp)
+    app.register_blueprint(calendar.bp)
+    app.register_blueprint(ics_upload.bp)
+
+    app.add_url_rule("/", view_func=home)
+    app.add_url_rule("/health/pool", view_func=health_pool)
+
+    if os.getenv("DB_CHECK_ON_STARTUP", "false").lower() in ("1", "true", "yes"):
+        check_connection()
+
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_scheduler()
+
+    # pick up calendar imports a previous process left behind; from the
+    # first request of each worker, so a preloading parent (gunicorn
+    # --preload) never runs import threads that its children would inherit
+    if os.getenv("ICS_IMPORT_RECOVER", "true").lower() not in ("0", "false", "no"):
+        from backend import import_jobs
+        app.before_request(import_jobs.start)
+
+    return app
+
+
+def start_scheduler():
+    """Reminders and feasibility refresh in a background thread of this process."""
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from backend.reminder import deadline_reminder_job
+    from backend.feasibility import feasibility_job, INTERVAL_MINUTES
+    from datetime import datetime
+
     scheduler = BackgroundScheduler(daemon=True)
     scheduler.add_job(
         deadline_reminder_job,
@@ -48,12 +83,39 @@ if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
         hours=1,
         next_run_time=datetime.utcnow()
     )
+    scheduler.add_job(
+        feasibility_job,
+        "interval",
+        minutes=INTERVAL_MINUTES,
+        next_run_time=datetime.now()
+    )
     scheduler.start()
+    return scheduler
+
 
-@app.route("/")
 def home():
     try:
         return render_template('home.html')
     except Exception as e:
         logger.error(f"Error rendering home.html: {str(e)}")
         return f"Error loading the home page: {str(e)}", 500
+
+
+def health_pool():
+    """Connection pool usage of this worker process, for sizing DB_POOL_SIZE / DB_MAX_OVERFLOW."""
+    from backend.db import pool_stats
+    return jsonify(pool_stats())
+
+
+_app = None
+
+
+def __getattr__(name):
+    # `backend.app:app` (WSGI servers, `from backend.app import app`) builds
+    # the app on first access instead of at import
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,245 @@
+# backend/bitmaps.py
+"""
+Per-user, per-day free/busy bitmaps (table day_bitmaps).
+
+Each day is SLOTS_PER_DAY bits at slots.SLOT_MINUTES resolution, stored as
+little-endian bytea: `free` marks slots entirely covered by availability,
+`busy` slots touched by a busy event, series occurrence or booked work
+session (of every project the user attends, see session_attendees). The
+write paths call refresh() for the days they changed, so group queries
+only AND a few words per member and day.
+
+    python -m backend.bitmaps        # (re)build every user's bitmaps
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import and_, exists, or_, select, union_all
+
+from backend import cache
+from backend.bulk import bulk_upsert
+from backend.calendar_sync import days_spanned, day_runs
+from backend.models import Availability, BusyTime, DayBitmap, Membership, Participation, Project, User, WorkSession
+from backend.ranges import overlaps
+from backend.recurrence import expand_series, default_window
+from backend.slots import SLOT, to_bits
+
+logger = logging.getLogger(__name__)
+
+SLOTS_PER_DAY = timedelta(days=1) // SLOT
+DAY_BYTES     = (SLOTS_PER_DAY + 7) // 8
+RUN_CHUNK     = 100
+
+
+def pack(bits):
+    return bits.to_bytes(DAY_BYTES, "little")
+
+
+def unpack(data):
+    return int.from_bytes(data, "little")
+
+
+# ---------- session attendees ----------
+def session_attendees():
+    """
+    Subquery of (user_id, project_id): whose time a project's work sessions
+    take. Its participants, or the whole group when nobody signed up
+    explicitly – the rule of feasibility.project_members, in SQL.
+    """
+    participants = select(Participation.user_id, Participation.project_id)
+    group = (
+        select(Membership.user_id, Project.project_id)
+          .join(Membership, Membership.group_id == Project.group_id)
+          .where(~exists().where(Participation.project_id == Project.project_id))
+    )
+    return union_all(participants, group).subquery("attendees")
+
+
+def attendees_of(db, project_ids):
+    """User ids whose bitmaps carry the sessions of `project_ids`."""
+    a = session_attendees()
+    return {uid for uid, in db.query(a.c.user_id).filter(a.c.project_id.in_(list(project_ids)))}
+
+
+def session_days(db, project_ids):
+    return {
+        d
+        for s, e in db.query(WorkSession.start_time, WorkSession.end_time)
+                      .filter(WorkSession.project_id.in_(list(project_ids)))
+        for d in days_spanned(s, e)
+    }
+
+
+def refresh_projects(db, project_ids, also=()):
+    """
+    Refresh the bitmaps on the session days of `project_ids` for their
+    current attendees and `also` (the attendees before a change).
+    """
+    days = session_days(db, project_ids)
+    if days:
+        refresh(db, attendees_of(db, project_ids) | set(also), days)
+
+
+# ---------- maintenance ----------
+def _overlapping(start_col, end_col, runs):
+    return or_(*[overlaps(start_col, end_col, a, b) for a, b in runs])
+
+
+def refresh(db, user_ids, days):
+    """
+    Recompute the bitmaps of `user_ids` for `days` from availabilities,
+    busy_times, series and work sessions, in the caller's transaction.
+    Every free/busy write ends up here, so it also bumps the users'
+    result-cache versions.
+    """
+    user_ids, days = list(user_ids), set(days)
+    if not user_ids or not days:
+        return
+    cache.bump(db, user_ids)
+
+    free, busy = {}, {}
+
+    def add(target, uid, s, e):
+        for d in days_spanned(s, e):
+            if d in days:
+                target.setdefault((uid, d), []).append((s, e))
+
+    runs = day_runs(days)
+    for i in range(0, len(runs), RUN_CHUNK):
+        chunk = runs[i:i + RUN_CHUNK]
+        db.query(DayBitmap).filter(
+            DayBitmap.user_id.in_(user_ids),
+            or_(*[and_(DayBitmap.day >= a.date(), DayBitmap.day < b.date()) for a, b in chunk])
+        ).delete(synchronize_session=False)
+
+        for uid, s, e in (
+            db.query(Availability.user_id, Availability.start_time, Availability.end_time)
+              .filter(Availability.user_id.in_(user_ids),
+                      _overlapping(Availability.start_time, Availability.end_time, chunk))
+        ):
+            add(free, uid, s, e)
+        for uid, s, e in (
+            db.query(BusyTime.user_id, BusyTime.start_time, BusyTime.end_time)
+              .filter(BusyTime.user_id.in_(user_ids),
+                      _overlapping(BusyTime.start_time, BusyTime.end_time, chunk))
+        ):
+            add(busy, uid, s, e)
+        attendees = session_attendees()
+        for uid, s, e in (
+            db.query(attendees.c.user_id, WorkSession.start_time, WorkSession.end_time)
+              .join(WorkSession, WorkSession.project_id == attendees.c.project_id)
+              .filter(attendees.c.user_id.in_(user_ids),
+                      _overlapping(WorkSession.start_time, WorkSession.end_time, chunk))
+        ):
+            add(busy, uid, s, e)
+
+    # series occurrences only exist inside the recurrence horizon
+    lo, hi = default_window()
+    lo, hi = max(lo, runs[0][0]), min(hi, runs[-1][1])
+    if lo < hi:
+        for uid, s, e, _ in expand_series(db, user_ids, lo, hi):
+            add(busy, uid, s, e)
+
+    def rows():
+        for key in free.keys() | busy.keys():
+            uid, d = key
+            midnight = datetime.combine(d, time.min)
+            yield (uid, d,
+                   pack(to_bits(free.get(key, ()), midnight, SLOTS_PER_DAY)),
+                   pack(to_bits(busy.get(key, ()), midnight, SLOTS_PER_DAY, partial=True)))
+
+    # upsert: a concurrent refresh of the same user and day may have
+    # written the row after our delete
+    bulk_upsert(db, DayBitmap, ["user_id", "day", "free", "busy"], rows(), key=["user_id", "day"])
+
+
+def rebuild(db, user_id):
+    """Recompute every bitmap of one user."""
+    db.query(DayBitmap).filter(DayBitmap.user_id == user_id).delete(synchronize_session=False)
+    attendees = session_attendees()
+    spans = (
+        db.query(Availability.start_time, Availability.end_time)
+          .filter(Availability.user_id == user_id).all()
+        + db.query(BusyTime.start_time, BusyTime.end_time)
+            .filter(BusyTime.user_id == user_id).all()
+        + db.query(WorkSession.start_time, WorkSession.end_time)
+            .join(attendees, attendees.c.project_id == WorkSession.project_id)
+            .filter(attendees.c.user_id == user_id).all()
+        + [(s, e) for _, s, e, _ in expand_series(db, [user_id], *default_window())]
+    )
+    refresh(db, [user_id], {d for s, e in spans for d in days_spanned(s, e)})
+
+
+# ---------- queries ----------
+def load(db, user_ids, first_day, last_day):
+    """{user_id: {day: word}} of the slots each user is free and not busy."""
+    out = {}
+    if not user_ids:
+        return out
+    for uid, day, free, busy in (
+        db.query(DayBitmap.user_id, DayBitmap.day, DayBitmap.free, DayBitmap.busy)
+          .filter(DayBitmap.user_id.in_(list(user_ids)),
+                  DayBitmap.day >= first_day, DayBitmap.day <= last_day)
+    ):
+        word = unpack(free) & ~unpack(busy)
+        if word:
+            out.setdefault(uid, {})[day] = word
+    return out
+
+
+def combine(words, user_ids, first_day):
+    """
+    AND the loaded words of `user_ids` day by day into one bitmap counted
+    from midnight of first_day. A user without a word for a day has no
+    free time on it.
+    """
+    user_ids = set(user_ids)
+    if not user_ids or not user_ids <= words.keys():
+        return 0
+    # the member with the fewest free days bounds the days to look at
+    fewest = min(user_ids, key=lambda uid: len(words[uid]))
+    bits = 0
+    for day, word in words[fewest].items():
+        for uid in user_ids:
+            word &= words[uid].get(day, 0)
+            if not word:
+                break
+        else:
+            bits |= word << ((day - first_day).days * SLOTS_PER_DAY)
+    return bits
+
+
+def common_free(db, user_ids, first_day, last_day):
+    """
+    Slots in [first_day, last_day] where every user is free and not busy,
+    as one bitmap counted from midnight of first_day.
+    """
+    return combine(load(db, user_ids, first_day, last_day), user_ids, first_day)
+
+
+def busy_users(db, user_ids, start, end):
+    """The subset of `user_ids` with busy time anywhere in [start, end)."""
+    user_ids = list(user_ids)
+    days = set(days_spanned(start, end))
+    if not user_ids or not days:
+        return set()
+    hit = set()
+    for uid, day, busy in (
+        db.query(DayBitmap.user_id, DayBitmap.day, DayBitmap.busy)
+          .filter(DayBitmap.user_id.in_(user_ids), DayBitmap.day.in_(days))
+    ):
+        midnight = datetime.combine(day, time.min)
+        if unpack(busy) & to_bits([(start, end)], midnight, SLOTS_PER_DAY, partial=True):
+            hit.add(uid)
+    return hit
+
+
+if __name__ == "__main__":
+    from backend.db import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+    with SessionLocal() as db:
+        for (uid,) in db.query(User.user_id).order_by(User.user_id).all():
+            rebuild(db, uid)
+            db.commit()
+            logger.info("Rebuilt day bitmaps of user %s", uid)
@@ -0,0 +1,131 @@
+# backend/bulk.py
+"""
+Bulk row writer for large imports.
+
+On PostgreSQL + psycopg2 rows are streamed with COPY FROM STDIN in fixed
+size batches; any other backend falls back to an executemany INSERT. Both
+paths write inside the caller's session transaction, so the caller still
+decides when to commit.
+
+bulk_upsert() is for derived tables that concurrent transactions rewrite
+(day_bitmaps, project_feasibility): an INSERT ... ON CONFLICT DO UPDATE
+waits for the other writer instead of failing on the primary key.
+"""
+import io
+import logging
+import time
+from collections import namedtuple
+from datetime import date, datetime
+from itertools import islice
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+
+class BulkStats(namedtuple("BulkStats", ["rows", "seconds"])):
+    @property
+    def rate(self):
+        """Rows per second (0 when nothing was written)."""
+        return self.rows / self.seconds if self.rows and self.seconds else 0.0
+
+
+def bulk_insert(db, table, columns, rows, batch_size=BATCH_SIZE):
+    """
+    Insert an iterable of row tuples (ordered like `columns`) into `table`
+    (a Table or mapped class) and return BulkStats.
+    """
+    table = getattr(table, "__table__", table)
+    conn = db.connection()
+
+    started = time.perf_counter()
+    if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2":
+        count = _copy_rows(conn, table, columns, rows, batch_size)
+    else:
+        count = _insert_rows(conn, table, columns, rows, batch_size)
+    stats = BulkStats(count, time.perf_counter() - started)
+
+    if count:
+        logger.info("bulk insert into %s: %d rows in %.3fs (%.0f rows/s)",
+                    table.name, stats.rows, stats.seconds, stats.rate)
+    return stats
+
+
+def bulk_upsert(db, table, columns, rows, key, batch_size=BATCH_SIZE):
+    """
+    Insert row tuples like bulk_insert(), updating the other columns of
+    rows whose `key` columns already exist. Rows are written in key order,
+    so two transactions lock shared keys in the same order. Returns BulkStats.
+    """
+    table = getattr(table, "__table__", table)
+    conn = db.connection()
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key),
+        set_={c: stmt.excluded[c] for c in columns if c not in key},
+    )
+    at = [columns.index(c) for c in key]
+
+    started = time.perf_counter()
+    count = 0
+    for batch in _batches(sorted(rows, key=lambda row: [row[i] for i in at]), batch_size):
+        conn.execute(stmt, [dict(zip(columns, row)) for row in batch])
+        count += len(batch)
+    stats = BulkStats(count, time.perf_counter() - started)
+
+    if count:
+        logger.info("bulk upsert into %s: %d rows in %.3fs (%.0f rows/s)",
+                    table.name, stats.rows, stats.seconds, stats.rate)
+    return stats
+
+
+def _batches(rows, size):
+    it = iter(rows)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+# ---------- PostgreSQL COPY ----------
+def _copy_value(v):
+    if v is None:
+        return r"\N"
+    if isinstance(v, (datetime, date)):
+        return v.isoformat(sep=" ") if isinstance(v, datetime) else v.isoformat()
+    if isinstance(v, bytes):
+        return r"\\x" + v.hex()
+    return (str(v).replace("\\", "\\\\").replace("\t", "\\t")
+                  .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def _copy_rows(conn, table, columns, rows, batch_size):
+    prep = conn.dialect.identifier_preparer
+    cols = ", ".join(prep.quote(c) for c in columns)
+    sql = f"COPY {prep.format_table(table)} ({cols}) FROM STDIN"
+
+    count = 0
+    cursor = conn.connection.cursor()
+    try:
+        for batch in _batches(rows, batch_size):
+            buf = io.StringIO()
+            for row in batch:
+                buf.write("\t".join(_copy_value(v) for v in row))
+                buf.write("\n")
+            buf.seek(0)
+            cursor.copy_expert(sql, buf)
+            count += len(batch)
+    finally:
+        cursor.close()
+    return count
+
+
+# ---------- portable fallback ----------
+def _insert_rows(conn, table, columns, rows, batch_size):
+    count = 0
+    for batch in _batches(rows, batch_size):
+        conn.execute(table.insert(), [dict(zip(columns, row)) for row in batch])
+        count += len(batch)
+    return count
@@ -0,0 +1,191 @@
+# backend/cache.py
+"""
+Versioned result cache for availability computations.
+
+Every user has a change counter in user_versions that is bumped whenever
+their availability, busy time or sessions change (bitmaps.refresh does it
+for all write paths). Results are cached under
+
+    (scope, window, ((user_id, version), ...))
+
+so a lookup is one small version query plus a dict hit, and a stale entry
+can never be served: any write produces a new key, and the old entry just
+ages out of the LRU.
+
+Entries live in a bounded in-process LRU. With RESULT_CACHE_DIR set, they
+are also written as pickles to that directory, so several worker processes
+on one machine share them. Unpickling runs code, so the directory is
+created with mode 0700 and ignored (with a warning) unless it is a real
+directory owned by this user that nobody else can access.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import stat
+import tempfile
+import threading
+from collections import OrderedDict
+
+from backend.models import UserVersion
+
+logger = logging.getLogger(__name__)
+
+MAX_ENTRIES        = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "512"))
+SHARED_DIR         = os.getenv("RESULT_CACHE_DIR")
+SHARED_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_DIR_MAX_ENTRIES", "4096"))
+
+_lru = OrderedDict()
+_lock = threading.Lock()
+_shared_ok = None
+
+
+# ---------- versions ----------
+def bump(db, user_ids):
+    """Increment the change counters of `user_ids` in the caller's transaction."""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        for uid in user_ids:
+            row = db.get(UserVersion, uid)
+            if row is None:
+                db.add(UserVersion(user_id=uid, version=1))
+            else:
+                row.version += 1
+        return
+
+    stmt = insert(UserVersion).values([{"user_id": uid, "version": 1} for uid in user_ids])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[UserVersion.user_id],
+        set_={"version": UserVersion.version + 1},
+    ))
+
+
+def versions(db, user_ids):
+    """((user_id, version), ...) sorted by user id; users never bumped are at 0."""
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return ()
+    found = dict(
+        db.query(UserVersion.user_id, UserVersion.version)
+          .filter(UserVersion.user_id.in_(user_ids))
+          .all()
+    )
+    return tuple((uid, found.get(uid, 0)) for uid in user_ids)
+
+
+# ---------- storage ----------
+def _check_shared_dir():
+    try:
+        os.makedirs(SHARED_DIR, mode=0o700, exist_ok=True)
+        st = os.lstat(SHARED_DIR)
+    except OSError as e:
+        logger.warning("Shared result cache disabled: %s", e)
+        return False
+    problem = None
+    if not stat.S_ISDIR(st.st_mode):
+        problem = "not a directory"
+    elif hasattr(os, "geteuid"):
+        if st.st_uid != os.geteuid():
+            problem = "owned by another user"
+        elif st.st_mode & 0o077:
+            problem = f"accessible to other users (mode {stat.S_IMODE(st.st_mode):o}, needs 700)"
+    if problem:
+        logger.warning("Shared result cache disabled: %s is %s", SHARED_DIR, problem)
+        return False
+    return True
+
+
+def _shared_enabled():
+    """Whether RESULT_CACHE_DIR is set and safe to load pickles from (checked once per process)."""
+    global _shared_ok
+    if not SHARED_DIR:
+        return False
+    if _shared_ok is None:
+        _shared_ok = _check_shared_dir()
+    return _shared_ok
+
+
+def _shared_path(key):
+    return os.path.join(SHARED_DIR, hashlib.sha1(repr(key).encode("utf-8")).hexdigest() + ".pickle")
+
+
+def _shared_get(key):
+    try:
+        with open(_shared_path(key), "rb") as fp:
+            stored_key, value = pickle.load(fp)
+    except (OSError, pickle.PickleError, EOFError):
+        return None
+    return value if stored_key == key else None
+
+
+def _shared_put(key, value):
+    try:
+        fd, tmp = tempfile.mkstemp(dir=SHARED_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fp:
+            pickle.dump((key, value), fp, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, _shared_path(key))
+        _shared_prune()
+    except OSError as e:
+        logger.warning("Could not write shared cache entry: %s", e)
+
+
+def _shared_prune():
+    entries = [e for e in os.scandir(SHARED_DIR) if e.name.endswith(".pickle")]
+    if len(entries) <= SHARED_MAX_ENTRIES:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for e in entries[:len(entries) - SHARED_MAX_ENTRIES]:
+        try:
+            os.remove(e.path)
+        except OSError:
+            pass
+
+
+def _get(key):
+    with _lock:
+        if key in _lru:
+            _lru.move_to_end(key)
+            return True, _lru[key]
+    if _shared_enabled():
+        value = _shared_get(key)
+        if value is not None:
+            _put(key, value, shared=False)
+            return True, value
+    return False, None
+
+
+def _put(key, value, shared=True):
+    with _lock:
+        _lru[key] = value
+        _lru.move_to_end(key)
+        while len(_lru) > MAX_ENTRIES:
+            _lru.popitem(last=False)
+    if shared and _shared_enabled():
+        _shared_put(key, value)
+
+
+# ---------- API ----------
+def cached(db, scope, user_ids, compute, window=None):
+    """
+    Return compute() for `scope` (a hashable tuple like ("group", 3)) over
+    `window`, reusing the previous result while none of `user_ids` changed.
+    """
+    key = (scope, window, versions(db, user_ids))
+    hit, value = _get(key)
+    if hit:
+        return value
+    value = compute()
+    _put(key, value)
+    return value
+
+
+def clear():
+    with _lock:
+        _lru.clear()
@@ -0,0 +1,227 @@
+# backend/calendar_sync.py
+"""
+Diff-based (idempotent) import of one calendar into busy_times.
+
+Rows are keyed on (user_id, calendar_id, uid, recurrence_id) and carry a
+hash of their content, so re-uploading a calendar only touches the events
+that were added, changed or removed since the previous upload. Recurring
+masters go to busy_series (one row per series, expanded on read).
+"""
+import hashlib
+import logging
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import bindparam
+
+from backend.bulk import bulk_insert
+from backend.models import BusyTime, BusySeries
+from backend.recurrence import series_until, format_exdates, occurrences, default_window
+
+logger = logging.getLogger(__name__)
+
+DELETE_CHUNK = 1000
+
+# `days` holds every calendar date whose busy time changed
+SyncStats = namedtuple(
+    "SyncStats", ["inserted", "updated", "deleted", "unchanged", "rate", "days"],
+    defaults=(frozenset(),),
+)
+
+
+def days_spanned(start, end):
+    """Yield each calendar date the interval [start, end) touches."""
+    day = start.date()
+    last = (end - timedelta(microseconds=1)).date() if end > start else day
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+
+def day_runs(days):
+    """Collapse a set of dates into sorted [start, end) datetime ranges of consecutive days."""
+    runs = []
+    for d in sorted(days):
+        start = datetime.combine(d, time.min)
+        if runs and runs[-1][1] == start:
+            runs[-1][1] = start + timedelta(days=1)
+        else:
+            runs.append([start, start + timedelta(days=1)])
+    return runs
+
+
+def event_hash(ev):
+    payload = f"{ev.start.isoformat()}|{ev.end.isoformat()}|{ev.summary}"
+    if ev.rrule:
+        payload += f"|{ev.rrule}|{ev.tzid}|{format_exdates(ev.exdates)}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def sync_calendar(db, user_id, calendar_id, events):
+    """
+    Bring the user's busy_times for `calendar_id` in line with `events`
+    (an iterable of IcsEvent). Nothing is committed; the caller owns the
+    transaction. Returns SyncStats.
+    """
+    rows = (
+        db.query(BusyTime.busy_time_id, BusyTime.uid, BusyTime.recurrence_id, BusyTime.content_hash,
+                 BusyTime.start_time, BusyTime.end_time)
+          .filter(BusyTime.user_id == user_id, BusyTime.calendar_id == calendar_id)
+          .all()
+    )
+    # rows from legacy imports (uid IS NULL) never match and are replaced;
+    # import_calendars() clears them before the first calendar anyway
+    existing = {
+        ((uid, rid) if uid is not None else (None, bid)): (bid, h, s, e)
+        for bid, uid, rid, h, s, e in rows
+    }
+
+    seen = set()
+    updates = []
+    series = []
+    days = set()
+    unchanged = 0
+
+    def touch(start, end, recurrence_id=None):
+        days.update(days_spanned(start, end))
+        # an override also hides/reveals the series occurrence it replaces
+        if recurrence_id is not None:
+            days.add(recurrence_id.date())
+
+    def new_rows():
+        nonlocal unchanged
+        for ev in events:
+            if ev.rrule and ev.uid:
+                series.append(ev)
+                continue
+            if ev.end < ev.start:
+                logger.warning("Skipping event %s that ends before it starts", ev.uid)
+                continue
+            h = event_hash(ev)
+            # events without a UID are keyed on their content instead
+            key = (ev.uid or f"nouid-{h}", ev.recurrence_id)
+            if key in seen:
+                continue
+            seen.add(key)
+
+            old = existing.get(key)
+            if old is None:
+                touch(ev.start, ev.end, ev.recurrence_id)
+                yield (user_id, calendar_id, key[0], ev.recurrence_id,
+                       ev.start, ev.end, ev.summary[:250], h)
+            elif old[1] != h:
+                touch(old[2], old[3])
+                touch(ev.start, ev.end, ev.recurrence_id)
+                updates.append({
+                    "b_id": old[0], "b_start": ev.start, "b_end": ev.end,
+                    "b_desc": ev.summary[:250], "b_hash": h,
+                })
+            else:
+                unchanged += 1
+
+    stats = bulk_insert(
+        db, BusyTime,
+        ["user_id", "calendar_id", "uid", "recurrence_id",
+         "start_time", "end_time", "description", "content_hash"],
+        new_rows()
+    )
+
+    if updates:
+        table = BusyTime.__table__
+        db.execute(
+            table.update()
+                 .where(table.c.busy_time_id == bindparam("b_id"))
+                 .values(start_time=bindparam("b_start"), end_time=bindparam("b_end"),
+                         description=bindparam("b_desc"), content_hash=bindparam("b_hash")),
+            updates
+        )
+
+    stale = []
+    for key, (bid, _, start, end) in existing.items():
+        if key not in seen:
+            stale.append(bid)
+            touch(start, end, key[1] if key[0] is not None else None)
+    for i in range(0, len(stale), DELETE_CHUNK):
+        db.query(BusyTime).filter(
+            BusyTime.busy_time_id.in_(stale[i:i + DELETE_CHUNK])
+        ).delete(synchronize_session=False)
+
+    s_ins, s_upd, s_del, s_same = _sync_series(db, user_id, calendar_id, series, days)
+
+    return SyncStats(stats.rows + s_ins, len(updates) + s_upd, len(stale) + s_del,
+                     unchanged + s_same, stats.rate, frozenset(days))
+
+
+def replace_legacy_rows(db, user_id):
+    """
+    Delete the user's busy_times from imports that predate event UIDs
+    (uid IS NULL); sync_calendar() can't match them to anything, so the
+    first import after the upgrade replaces them. Returns (count, days).
+    """
+    table = BusyTime.__table__
+    rows = db.execute(
+        table.delete()
+             .where(table.c.user_id == user_id, table.c.uid.is_(None))
+             .returning(table.c.start_time, table.c.end_time)
+    ).all()
+    return len(rows), {d for s, e in rows for d in days_spanned(s, e)}
+
+
+def _series_days(row):
+    """Days covered by a series' occurrences inside the default horizon."""
+    return {
+        d for start, end in occurrences(row, *default_window())
+        for d in days_spanned(start, end)
+    }
+
+
+def _sync_series(db, user_id, calendar_id, events, days):
+    """Same diff as above for recurring masters; series are few, so plain ORM."""
+    existing = {
+        s.uid: s for s in
+        db.query(BusySeries)
+          .filter(BusySeries.user_id == user_id, BusySeries.calendar_id == calendar_id)
+          .all()
+    }
+    inserted = updated = unchanged = 0
+    seen = set()
+    for ev in events:
+        if ev.uid in seen:
+            continue
+        seen.add(ev.uid)
+        h = event_hash(ev)
+        row = existing.get(ev.uid)
+        if row is not None and row.content_hash == h:
+            unchanged += 1
+            continue
+        try:
+            until = series_until(ev.start, ev.end, ev.rrule, ev.tzid)
+        except ValueError:
+            logger.warning("Skipping unparseable RRULE %r (uid %s)", ev.rrule, ev.uid)
+            continue
+
+        if row is None:
+            row = BusySeries(user_id=user_id, calendar_id=calendar_id, uid=ev.uid)
+            db.add(row)
+            inserted += 1
+        else:
+            days.update(_series_days(row))
+            updated += 1
+        row.start_time   = ev.start
+        row.end_time     = ev.end
+        row.tzid         = ev.tzid
+        row.rrule        = ev.rrule
+        row.exdates      = format_exdates(ev.exdates)
+        row.until_time   = until
+        row.description  = ev.summary[:250]
+        row.content_hash = h
+        days.update(_series_days(row))
+
+    deleted = 0
+    for uid, row in existing.items():
+        if uid not in seen:
+            days.update(_series_days(row))
+            db.delete(row)
+            deleted += 1
+    db.flush()
+    return inserted, updated, deleted, unchanged
@@ -1,8 +1,13 @@
+import functools
 import os
 import logging
+import threading
+import time
+from flask import g, request, session
 from sqlalchemy import create_engine, event, text
-from sqlalchemy.orm import sessionmaker, declarative_base
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.exc import SQLAlchemyError, TimeoutError as PoolTimeoutError
 from sqlalchemy.pool import QueuePool
 
 # Configure logging
@@ -15,47 +20,221 @@ DB_PASSWORD = os.getenv("DB_PASSWORD", "")
 DB_HOST     = os.getenv("DB_HOST", "localhost")
 DB_PORT     = os.getenv("DB_PORT", "5432")
 
-# SQLAlchemy engine (PostgreSQL) with connection pooling
-try:
-    engine = create_engine(
-        f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
+# Pool sizing: each worker process gets its own pool, so the database sees
+# up to workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections
+DB_POOL_SIZE    = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_SLOW_MS = float(os.getenv("DB_POOL_SLOW_MS", "100"))
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long checkouts wait and how often they time out."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            logger.error("Connection pool timed out after %.1fs (%s)", time.perf_counter() - started, self.status())
+            raise
+        waited = time.perf_counter() - started
+        with self._stats_lock:
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        if waited * 1000 >= DB_POOL_SLOW_MS:
+            logger.warning("Waited %.0f ms for a database connection (%s)", waited * 1000, self.status())
+        return conn
+
+    def stats(self):
+        with self._stats_lock:
+            checkouts, timeouts = self._checkouts, self._timeouts
+            wait_total, wait_max = self._wait_total, self._wait_max
+        return {
+            "size":         self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_in":   self.checkedin(),
+            "in_use":       self.checkedout(),
+            "overflow":     max(self.overflow(), 0),
+            "checkouts":    checkouts,
+            "timeouts":     timeouts,
+            "wait_avg_ms":  round(wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+            "wait_max_ms":  round(wait_max * 1000, 3),
+        }
+
+
+# SQLAlchemy engine (PostgreSQL) with connection pooling. It is created on
+# first use rather than at import, so importing the app costs no database
+# round trip, and a pre-fork server's workers each open their own sockets.
+DB_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Optional read replica (e.g. a streaming standby). Unset DB_REPLICA_HOST
+# sends everything to the primary. Views marked @replica_reads read from it
+# on GET unless the user wrote something in the last DB_REPLICA_RYW_SECONDS.
+DB_REPLICA_HOST     = os.getenv("DB_REPLICA_HOST")
+DB_REPLICA_PORT     = os.getenv("DB_REPLICA_PORT", DB_PORT)
+DB_REPLICA_NAME     = os.getenv("DB_REPLICA_NAME", DB_NAME)
+DB_REPLICA_USER     = os.getenv("DB_REPLICA_USER", DB_USER)
+DB_REPLICA_PASSWORD = os.getenv("DB_REPLICA_PASSWORD", DB_PASSWORD)
+DB_REPLICA_RYW_SECONDS = float(os.getenv("DB_REPLICA_RYW_SECONDS", "5"))
+DB_REPLICA_URL = (
+    f"postgresql+psycopg2://{DB_REPLICA_USER}:{DB_REPLICA_PASSWORD}"
+    f"@{DB_REPLICA_HOST}:{DB_REPLICA_PORT}/{DB_REPLICA_NAME}"
+    if DB_REPLICA_HOST else None
+)
+
+_engines = {}
+_engine_lock = threading.Lock()
+
+
+def _create_engine(url):
+    return create_engine(
+        url,
         future=True,
-        pool_size=5,
-        max_overflow=10,
-        pool_timeout=30,
-        pool_recycle=1800,  # Recycle connections after 30 minutes
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
         pool_pre_ping=True,  # Verify connection is still alive before using
-        poolclass=QueuePool
-    )
-    
-    # Test connection
-    with engine.connect() as conn:
-        conn.execute(text("SELECT 1"))
-        logger.info("Database connection successful")
-        
-except SQLAlchemyError as e:
-    logger.error(f"Database connection failed: {str(e)}")
-    # Create a dummy engine that will raise appropriate errors when used
-    engine = create_engine(
-        f"postgresql+psycopg2://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}",
-        future=True
+        poolclass=InstrumentedQueuePool
     )
 
-# Event listener to handle connection errors
-@event.listens_for(engine, "connect", insert=True)
-def ping_connection(dbapi_connection, connection_record):
+
+def _lazy_engine(role, url):
+    engine = _engines.get(role)
+    if engine is None:
+        with _engine_lock:
+            engine = _engines.get(role)
+            if engine is None:
+                engine = _engines[role] = _create_engine(url)
+    return engine
+
+
+def get_engine():
+    return _lazy_engine("primary", DB_URL)
+
+
+def get_replica_engine():
+    """The replica engine, or None when no replica is configured."""
+    return _lazy_engine("replica", DB_REPLICA_URL) if DB_REPLICA_URL else None
+
+
+def _after_fork_in_child():
+    # connections inherited from the parent belong to it; start with an
+    # empty pool without closing the parent's sockets
+    for engine in _engines.values():
+        engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def __getattr__(name):
+    # `from backend.db import engine` keeps working
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def check_connection():
+    """Open one connection and log whether the database is reachable."""
     try:
-        cursor = dbapi_connection.cursor()
-        cursor.execute("SELECT 1")
-        cursor.close()
-    except Exception:
-        # Reconnect if connection is invalid
-        logger.warning("Database connection invalid, reconnecting...")
-        connection_record.connection = None
-        raise
-
-# "SessionLocal" factory to produce Session objects
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+        with get_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+        logger.info("Database connection successful")
+        return True
+    except SQLAlchemyError as e:
+        logger.error(f"Database connection failed: {str(e)}")
+        return False
+
+
+class RoutingSession(Session):
+    """
+    Session that reads from the replica when info["replica"] is set.
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary,
+    so a read-only view that happens to write stays correct.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        if self.info.get("replica") and not self._flushing and not isinstance(clause, UpdateBase):
+            return get_replica_engine()
+        return super().get_bind(mapper, clause=clause, **kw)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _remember_write(db, flush_context):
+    db.info["wrote"] = True
+
+
+_sessionmaker = sessionmaker(class_=RoutingSession, autoflush=False, autocommit=False, future=True)
+
+
+def SessionLocal(**kwargs):
+    """Session bound to this process's engine (used like a sessionmaker)."""
+    return _sessionmaker(bind=get_engine(), **kwargs)
+
+
+def pool_stats():
+    """Checkout counters of the engine's pool(s); other pool classes just report their status line."""
+    def stats(pool):
+        return pool.stats() if isinstance(pool, InstrumentedQueuePool) else {"status": pool.status()}
+    result = stats(get_engine().pool)
+    if DB_REPLICA_URL:
+        result["replica"] = stats(get_replica_engine().pool)
+    return result
+
+
+# ---------- request-scoped session ----------
+def replica_reads(view):
+    """Mark a read-only view whose GET requests may be served from the replica."""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        g.replica_ok = True
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _use_replica():
+    if not DB_REPLICA_URL or not g.get("replica_ok") or request.method not in ("GET", "HEAD"):
+        return False
+    # read-your-writes: right after their own write a user reads the primary
+    wrote_at = session.get("db_wrote_at", 0)
+    return time.time() - wrote_at >= DB_REPLICA_RYW_SECONDS
+
+
+def get_db():
+    """The current request's session, opened on first use and closed in close_db."""
+    if "db" not in g:
+        g.db = SessionLocal(info={"replica": _use_replica()})
+    return g.db
+
+
+def remember_writes(response):
+    """after_request hook: start the user's read-your-writes window when this request wrote."""
+    db = g.get("db")
+    if request.method not in ("GET", "HEAD", "OPTIONS") or (db is not None and db.info.get("wrote")):
+        session["db_wrote_at"] = time.time()
+    return response
+
+
+def close_db(exc=None):
+    """App-context teardown: roll back anything left uncommitted and return the connection."""
+    db = g.pop("db", None)
+    if db is not None:
+        db.close()
 
 # Base class for all ORM models
 Base = declarative_base()
@@ -0,0 +1,106 @@
+# backend/feasibility.py
+"""
+Deadline feasibility of open projects.
+
+For every project whose deadline hasn't passed, compares the members'
+common free hours left before the deadline (from the day bitmaps) with
+the estimated hours not yet booked as work sessions, and stores the result
+in project_feasibility. Run periodically by the scheduler in app.py and
+for single projects whenever they change.
+"""
+import logging
+import os
+import time
+from datetime import datetime
+
+from backend import bitmaps
+from backend.bulk import bulk_upsert
+from backend.db import SessionLocal
+from backend.models import Project, Participation, Membership, WorkSession, ProjectFeasibility
+from backend.slots import SLOT_MINUTES, horizon, slot_index, to_bits
+
+logger = logging.getLogger(__name__)
+
+INTERVAL_MINUTES = int(os.getenv("FEASIBILITY_INTERVAL_MINUTES", "30"))
+
+
+def project_members(db, projects):
+    """
+    {project_id: set of user ids} for (project_id, group_id, ...) rows: the
+    participants, or the whole group if nobody signed up explicitly.
+    """
+    participants, members = {}, {}
+    for pid, uid in (
+        db.query(Participation.project_id, Participation.user_id)
+          .filter(Participation.project_id.in_([p[0] for p in projects]))
+    ):
+        participants.setdefault(pid, set()).add(uid)
+    for gid, uid in (
+        db.query(Membership.group_id, Membership.user_id)
+          .filter(Membership.group_id.in_({p[1] for p in projects}))
+    ):
+        members.setdefault(gid, set()).add(uid)
+    return {p[0]: participants.get(p[0]) or members.get(p[1], set()) for p in projects}
+
+
+def compute(db, project_ids=None, now=None):
+    """
+    Recompute project_feasibility for `project_ids` (every project when
+    None) in the caller's transaction. Returns the number of rows written.
+    """
+    now = now or datetime.now()
+
+    q = db.query(Project.project_id, Project.group_id, Project.deadline, Project.estimated_hours_needed)
+    old = db.query(ProjectFeasibility)
+    if project_ids is not None:
+        project_ids = list(project_ids)
+        q = q.filter(Project.project_id.in_(project_ids))
+        old = old.filter(ProjectFeasibility.project_id.in_(project_ids))
+    # closed projects drop out of the table
+    old.delete(synchronize_session=False)
+    projects = q.filter(Project.deadline > now).all()
+    if not projects:
+        return 0
+    ids = [p.project_id for p in projects]
+
+    sessions = {}
+    for pid, s, e in (
+        db.query(WorkSession.project_id, WorkSession.start_time, WorkSession.end_time)
+          .filter(WorkSession.project_id.in_(ids))
+    ):
+        sessions.setdefault(pid, []).append((s, e))
+
+    # one read of every member's bitmaps up to the latest deadline
+    people = project_members(db, projects)
+    origin, first, _ = horizon(now, now)
+    words = bitmaps.load(db, set().union(*people.values()),
+                         origin.date(), max(p.deadline for p in projects).date())
+
+    def rows():
+        for pid, _, deadline, hours_needed in projects:
+            n_slots = max(slot_index(origin, deadline), first)
+            free = bitmaps.combine(words, people[pid], origin.date())
+            free &= ((1 << n_slots) - 1) ^ ((1 << first) - 1)
+            # the project's own sessions, even if booked for non-participants
+            free &= ~to_bits(sessions.get(pid, ()), origin, n_slots, partial=True)
+            free_hours = bin(free).count("1") * SLOT_MINUTES / 60
+            booked_hours = sum((e - s).total_seconds() for s, e in sessions.get(pid, ())) / 3600
+            remaining = max((hours_needed or 0) - booked_hours, 0)
+            yield pid, free_hours, booked_hours, remaining, free_hours >= remaining, now
+
+    # upsert: the scheduled job and a project change may both recompute a
+    # project, and the other one's row may appear after our delete
+    return bulk_upsert(
+        db, ProjectFeasibility,
+        ["project_id", "free_hours", "booked_hours", "remaining_hours", "feasible", "computed_at"],
+        rows(), key=["project_id"]
+    ).rows
+
+
+def feasibility_job():
+    """Scheduled refresh of every project's feasibility."""
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        count = compute(db)
+        db.commit()
+    logger.info("Feasibility of %d projects computed in %.3fs", count, time.perf_counter() - started)
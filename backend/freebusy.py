@@ -0,0 +1,64 @@
+# backend/freebusy.py
+"""
+Database-side free/busy computation.
+
+Thin wrappers around the SQL functions from migration 007, which do the
+gap finding and intersections with tsmultirange in PostgreSQL so only the
+resulting windows cross the wire. Enabled with FREEBUSY_BACKEND=sql
+(PostgreSQL 14+); otherwise callers keep their Python implementation.
+"""
+import os
+
+from sqlalchemy import text
+
+FREEBUSY_BACKEND = os.getenv("FREEBUSY_BACKEND", "python")
+
+
+def use_sql(db):
+    # migration 007 only creates the functions on PostgreSQL 14+
+    if FREEBUSY_BACKEND != "sql" or db.get_bind().dialect.name != "postgresql":
+        return False
+    return db.connection().dialect.server_version_info >= (14,)
+
+
+def multirange_literal(intervals):
+    """Render (start, end) pairs as a tsmultirange literal."""
+    parts = ",".join(
+        f'["{s.isoformat(sep=" ")}","{e.isoformat(sep=" ")}")'
+        for s, e in intervals if s < e
+    )
+    return "{" + parts + "}"
+
+
+def free_windows(db, user_id, window_start, window_end, extra_busy=(), days=None,
+                 busy_days_only=False, day_start="08:00", day_end="20:00"):
+    """Free working-hour (start, end) windows of one user, computed in the database."""
+    return db.execute(
+        text("""
+            SELECT start_time, end_time
+            FROM user_free_windows(:uid, :lo, :hi, CAST(:ds AS time), CAST(:de AS time),
+                                   CAST(:extra AS tsmultirange), CAST(:days AS date[]), :only)
+        """),
+        {
+            "uid": user_id, "lo": window_start, "hi": window_end,
+            "ds": day_start, "de": day_end,
+            "extra": multirange_literal(extra_busy),
+            "days": sorted(days) if days is not None else None,
+            "only": busy_days_only,
+        }
+    ).all()
+
+
+def common_free(db, user_ids, window_start=None, window_end=None):
+    """(start, end) windows where every user has availability, computed in the database."""
+    if not user_ids:
+        return []
+    return db.execute(
+        text("""
+            SELECT start_time, end_time
+            FROM group_common_free(CAST(:uids AS integer[]),
+                                   COALESCE(CAST(:lo AS timestamp), '-infinity'),
+                                   COALESCE(CAST(:hi AS timestamp), 'infinity'))
+        """),
+        {"uids": list(user_ids), "lo": window_start, "hi": window_end}
+    ).all()
@@ -0,0 +1,252 @@
+# backend/ics_stream.py
+"""
+Streaming, line-oriented reader for uploaded .ics files.
+
+Only VEVENT components are looked at; everything else is skipped as it
+streams past, so memory use stays flat no matter how large the export is.
+read_calendar() also returns the VCALENDAR's own properties ahead of its
+first component (X-WR-CALNAME, X-WR-RELCALID, ...), which is where
+calendar clients put them.
+"""
+import io
+import re
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from itertools import chain
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+# rrule / exdates / tzid are only set on the master VEVENT of a recurring series
+IcsEvent = namedtuple(
+    "IcsEvent",
+    ["uid", "start", "end", "summary", "recurrence_id", "rrule", "exdates", "tzid"],
+    defaults=(None, None, (), None),
+)
+
+
+class IcsParseError(ValueError):
+    """Raised when an upload is not a usable iCalendar file."""
+
+
+# ---------- input ----------
+def unfold_lines(fp):
+    """Yield logical content lines from a binary file, joining folded lines."""
+    pending = None
+    for raw in fp:
+        raw = raw.rstrip(b"\r\n")
+        if raw[:1] in (b" ", b"\t"):
+            # continuation of the previous line (RFC 5545 §3.1)
+            if pending is not None:
+                pending += raw[1:]
+            continue
+        if pending is not None:
+            yield pending.decode("utf-8", "replace")
+        pending = raw
+    if pending is not None:
+        yield pending.decode("utf-8", "replace")
+
+
+def split_content_line(line):
+    """Split 'NAME;PARAM=x:value' into (NAME, {PARAM: x}, value)."""
+    in_quotes = False
+    for i, ch in enumerate(line):
+        if ch == '"':
+            in_quotes = not in_quotes
+        elif ch == ":" and not in_quotes:
+            head, value = line[:i], line[i + 1:]
+            break
+    else:
+        raise IcsParseError(f"Malformed content line: {line[:60]!r}")
+
+    name, *raw_params = head.split(";")
+    params = {}
+    for p in raw_params:
+        if "=" in p:
+            k, v = p.split("=", 1)
+            params[k.upper()] = v.strip('"')
+    return name.strip().upper(), params, value
+
+
+# ---------- components ----------
+def _calendar_lines(fp):
+    lines = (l for l in unfold_lines(fp) if l.strip())
+    first = next(lines, "").lstrip("\ufeff").strip().upper()
+    if first != "BEGIN:VCALENDAR":
+        raise IcsParseError("Not an iCalendar file")
+    return lines
+
+
+def iter_vevents(fp):
+    """
+    Yield one dict per top-level VEVENT, mapping property name to a list of
+    (params, value) pairs. Nested components (VALARM, ...) are skipped.
+    """
+    return _vevents(_calendar_lines(fp))
+
+
+def _vevents(lines):
+    props = None
+    depth = 0
+    for line in lines:
+        name, params, value = split_content_line(line)
+        if props is None:
+            if name == "BEGIN" and value.strip().upper() == "VEVENT":
+                props, depth = {}, 0
+            continue
+        if name == "BEGIN":
+            depth += 1
+        elif name == "END":
+            if depth:
+                depth -= 1
+            else:
+                yield props
+                props = None
+        elif depth == 0:
+            props.setdefault(name, []).append((params, value))
+
+
+def iter_events(fp):
+    """Yield a normalized IcsEvent(uid, start, end, summary, recurrence_id) per VEVENT."""
+    for props in iter_vevents(fp):
+        yield to_event(props)
+
+
+def read_calendar(fp):
+    """
+    Return (properties, events): the calendar's properties that precede its
+    first component, as {name: [(params, value), ...]}, and a lazy
+    iterator of IcsEvent for the rest of the file.
+    """
+    lines = _calendar_lines(fp)
+    props = {}
+    for line in lines:
+        name, params, value = split_content_line(line)
+        if name == "BEGIN":
+            return props, (to_event(p) for p in _vevents(chain([line], lines)))
+        props.setdefault(name, []).append((params, value))
+    return props, iter(())
+
+
+def parse_calendar(data):
+    """read_calendar() of a whole .ics payload (bytes), events as a list; used by worker processes."""
+    props, events = read_calendar(io.BytesIO(data))
+    return props, list(events)
+
+
+def calendar_name(props):
+    """The calendar's own identity: X-WR-RELCALID, else X-WR-CALNAME, else None."""
+    for name in ("X-WR-RELCALID", "X-WR-CALNAME"):
+        value = unescape_text(first_value(props, name) or "").strip()
+        if value:
+            return value
+    return None
+
+
+def to_event(props):
+    if "DTSTART" not in props:
+        raise IcsParseError("VEVENT without DTSTART")
+    start_params, start_value = props["DTSTART"][0]
+    start = parse_datetime(start_params, start_value)
+
+    if "DTEND" in props:
+        end = parse_datetime(*props["DTEND"][0])
+    elif "DURATION" in props:
+        end = start + parse_duration(props["DURATION"][0][1])
+    elif is_date_value(start_params, start_value):
+        end = start + timedelta(days=1)
+    else:
+        end = start
+
+    recurrence_id = None
+    if "RECURRENCE-ID" in props:
+        recurrence_id = parse_datetime(*props["RECURRENCE-ID"][0])
+
+    rrule, exdates, tzid = first_value(props, "RRULE"), (), None
+    if rrule:
+        exdates = tuple(
+            parse_datetime(params, v)
+            for params, value in props.get("EXDATE", [])
+            for v in value.split(",") if v.strip()
+        )
+        tzid = start_tzid(start_params, start_value)
+
+    summary = first_value(props, "SUMMARY") or first_value(props, "DESCRIPTION") or ""
+    return IcsEvent(first_value(props, "UID"), start, end, unescape_text(summary),
+                    recurrence_id, rrule, exdates, tzid)
+
+
+def first_value(props, name):
+    values = props.get(name)
+    return values[0][1] if values else None
+
+
+# ---------- value parsing ----------
+_DURATION_RE = re.compile(
+    r"^([+-])?P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?$"
+)
+
+
+@lru_cache(maxsize=64)
+def _zone(tzid):
+    try:
+        return ZoneInfo(tzid)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def is_date_value(params, value):
+    return params.get("VALUE") == "DATE" or len(value.strip()) == 8
+
+
+def start_tzid(params, value):
+    """Zone a DTSTART's wall-clock time belongs to (None for floating/date values)."""
+    if is_date_value(params, value):
+        return None
+    if value.strip().endswith("Z"):
+        return "UTC"
+    tzid = params.get("TZID")
+    return tzid if tzid and _zone(tzid) else None
+
+
+def parse_datetime(params, value):
+    """
+    Parse a DATE / DATE-TIME value into a naive datetime in server-local
+    time (same convention as the rest of the app). Floating times and
+    unknown TZIDs are taken as-is.
+    """
+    value = value.strip()
+    try:
+        if is_date_value(params, value):
+            return datetime.strptime(value[:8], "%Y%m%d")
+        if value.endswith("Z"):
+            dt = datetime.strptime(value[:-1], "%Y%m%dT%H%M%S").replace(tzinfo=timezone.utc)
+        else:
+            dt = datetime.strptime(value, "%Y%m%dT%H%M%S")
+            tz = _zone(params["TZID"]) if "TZID" in params else None
+            if tz is None:
+                return dt
+            dt = dt.replace(tzinfo=tz)
+    except ValueError:
+        raise IcsParseError(f"Invalid date value: {value!r}")
+    return dt.astimezone().replace(tzinfo=None)
+
+
+def parse_duration(value):
+    m = _DURATION_RE.match(value.strip())
+    if not m:
+        raise IcsParseError(f"Invalid duration: {value!r}")
+    sign, weeks, days, hours, minutes, seconds = m.groups()
+    delta = timedelta(
+        weeks=int(weeks or 0), days=int(days or 0),
+        hours=int(hours or 0), minutes=int(minutes or 0), seconds=int(seconds or 0),
+    )
+    return -delta if sign == "-" else delta
+
+
+def unescape_text(value):
+    """Undo RFC 5545 TEXT escaping (\\n, \\, \\; \\\\)."""
+    if "\\" not in value:
+        return value
+    return re.sub(r"\\([\\;,nN])",
+                  lambda m: "\n" if m.group(1) in "nN" else m.group(1),
+                  value)
@@ -0,0 +1,274 @@
+# backend/import_jobs.py
+"""
+Background processing of calendar uploads.
+
+The upload request only stores the payload and a queued import_jobs row,
+then wakes a small bounded thread pool. Its workers claim queued jobs from
+the table (FOR UPDATE SKIP LOCKED, so each job runs once across all app
+processes) and hold a PostgreSQL advisory lock on the job while it runs.
+Progress is kept in the table, so any app process can answer
+/ics/jobs/<id>.
+
+recover() runs in the background once per app process, from its first
+request (never in a parent that only preloads the app for forking): queued
+jobs left by a previous process are picked up again, running jobs whose
+lock nobody holds any more (their process died) are marked failed, and
+payload files that no pending job refers to are deleted.
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from backend.db import SessionLocal, get_engine
+from backend.ics_stream import IcsParseError
+from backend.models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+IMPORT_WORKERS = int(os.getenv("ICS_IMPORT_WORKERS", "2"))
+IMPORT_DIR     = os.getenv("ICS_IMPORT_DIR", os.path.join(tempfile.gettempdir(), "collabtool-imports"))
+CHUNK_SIZE     = 64 * 1024
+# payload files younger than this may belong to an upload still being stored
+ORPHAN_AGE_SECONDS = int(os.getenv("ICS_IMPORT_ORPHAN_AGE_SECONDS", "3600"))
+# first key of the (namespace, job_id) advisory locks held by running jobs
+LOCK_NAMESPACE = 6006
+
+_executor = None
+_started = False
+_start_lock = threading.Lock()
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="ics-import")
+    return _executor
+
+
+def _after_fork_in_child():
+    # the parent's worker threads don't exist in a forked child
+    global _executor, _started, _start_lock
+    _executor = None
+    _started = False
+    _start_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _postgres():
+    return get_engine().dialect.name == "postgresql"
+
+
+def submit_import(user_id, filename, stream):
+    """Store the upload on disk, queue a job for it and return the job id."""
+    os.makedirs(IMPORT_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=".upload", dir=IMPORT_DIR)
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(stream, out, CHUNK_SIZE)
+
+    with SessionLocal() as db:
+        job = ImportJob(user_id=user_id, filename=filename, payload_path=path, status="queued")
+        db.add(job)
+        db.commit()
+        job_id = job.job_id
+
+    executor().submit(drain)
+    return job_id
+
+
+def update_job(job_id, **fields):
+    """Write job progress in its own short transaction so pollers see it."""
+    with SessionLocal() as db:
+        db.query(ImportJob).filter(ImportJob.job_id == job_id).update(fields, synchronize_session=False)
+        db.commit()
+
+
+# ---------- claiming ----------
+def claim_next():
+    """
+    Mark the oldest queued job running and return (job_id, lock_conn), or
+    None when the queue is empty. On PostgreSQL lock_conn holds the job's
+    advisory lock until release() – proof for recover() that it is alive.
+    """
+    lock_conn = get_engine().connect() if _postgres() else None
+    try:
+        with SessionLocal() as db:
+            job_id = db.execute(
+                select(ImportJob.job_id)
+                  .where(ImportJob.status == "queued")
+                  .order_by(ImportJob.job_id)
+                  .limit(1)
+                  .with_for_update(skip_locked=True)
+            ).scalar()
+            if job_id is None:
+                release(lock_conn, None)
+                return None
+            if lock_conn is not None:
+                lock_conn.execute(select(func.pg_advisory_lock(LOCK_NAMESPACE, job_id)))
+                lock_conn.commit()
+            db.query(ImportJob).filter(ImportJob.job_id == job_id).update(
+                {"status": "running"}, synchronize_session=False)
+            db.commit()
+        return job_id, lock_conn
+    except BaseException:
+        release(lock_conn, None)
+        raise
+
+
+def release(lock_conn, job_id):
+    if lock_conn is None:
+        return
+    try:
+        if job_id is not None:
+            lock_conn.execute(select(func.pg_advisory_unlock(LOCK_NAMESPACE, job_id)))
+            lock_conn.commit()
+    finally:
+        lock_conn.close()
+
+
+def drain():
+    """Run queued jobs until none are left; submitted to the executor."""
+    while True:
+        try:
+            claimed = claim_next()
+        except SQLAlchemyError as e:
+            logger.error("Could not claim an import job: %s", e)
+            return
+        if claimed is None:
+            return
+        job_id, lock_conn = claimed
+        try:
+            run_import(job_id)
+        finally:
+            release(lock_conn, job_id)
+
+
+# ---------- recovery ----------
+def recover():
+    """Fail orphaned running jobs, restart queued ones and delete stray payloads."""
+    try:
+        with SessionLocal() as db:
+            running = db.execute(
+                select(ImportJob.job_id, ImportJob.payload_path)
+                  .where(ImportJob.status == "running")
+                  .with_for_update(skip_locked=True)
+            ).all()
+            orphaned = [
+                (job_id, path) for job_id, path in running
+                # the lock is free only if the process running the job is gone;
+                # the transaction-level lock taken here ends with the commit
+                if not _postgres() or db.execute(
+                    select(func.pg_try_advisory_xact_lock(LOCK_NAMESPACE, job_id))
+                ).scalar()
+            ]
+            if orphaned:
+                db.query(ImportJob).filter(ImportJob.job_id.in_([j for j, _ in orphaned])).update(
+                    {"status": "failed", "error": "Interrupted by a server restart; please upload again",
+                     "finished_at": datetime.now()},
+                    synchronize_session=False)
+            db.commit()
+            pending = {path for (path,) in db.query(ImportJob.payload_path)
+                                               .filter(ImportJob.status.in_(("queued", "running")))}
+    except SQLAlchemyError as e:
+        logger.error("Could not recover import jobs: %s", e)
+        return
+    for job_id, path in orphaned:
+        logger.warning("Import job %s was interrupted; marked failed", job_id)
+        if path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    _remove_stray_payloads(pending)
+    for _ in range(IMPORT_WORKERS):
+        executor().submit(drain)
+
+
+def _remove_stray_payloads(pending):
+    try:
+        entries = list(os.scandir(IMPORT_DIR))
+    except OSError:
+        return
+    cutoff = time.time() - ORPHAN_AGE_SECONDS
+    for entry in entries:
+        if not entry.name.endswith(".upload") or entry.path in pending:
+            continue
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                logger.info("Removed stray import payload %s", entry.path)
+        except OSError:
+            pass
+
+
+def start():
+    """
+    before_request hook: the first request of each process starts
+    recover() in the background; later calls return at once.
+    """
+    global _started
+    if _started:
+        return
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+    executor().submit(recover)
+
+
+# ---------- running ----------
+def run_import(job_id):
+    from backend.routes.ics_upload import open_calendars, import_calendars
+
+    with SessionLocal() as db:
+        job = (
+            db.query(ImportJob.user_id, ImportJob.filename, ImportJob.payload_path)
+              .filter(ImportJob.job_id == job_id)
+              .first()
+        )
+    if job is None:
+        return
+    user_id, filename, path = job
+
+    def progress(done, stats):
+        # best effort: a failed progress write must not abort the import
+        try:
+            update_job(job_id, calendars_done=done, rows_inserted=stats.inserted,
+                       rows_updated=stats.updated, rows_deleted=stats.deleted)
+        except SQLAlchemyError as e:
+            logger.warning("Could not record progress of import job %s: %s", job_id, e)
+
+    try:
+        with open(path, "rb") as fp:
+            total, calendars = open_calendars(fp, filename)
+            update_job(job_id, calendars_total=total)
+            with SessionLocal() as db:
+                stats = import_calendars(db, user_id, calendars, progress=progress)
+                db.commit()
+    except (IcsParseError, zipfile.BadZipFile) as e:
+        update_job(job_id, status="failed", error=f"Invalid calendar file: {e}",
+                   finished_at=datetime.now())
+    except Exception as e:
+        logger.exception("Import job %s failed", job_id)
+        update_job(job_id, status="failed", error=str(e), finished_at=datetime.now())
+    else:
+        update_job(job_id, status="done", rows_inserted=stats.inserted,
+                   rows_updated=stats.updated, rows_deleted=stats.deleted,
+                   finished_at=datetime.now())
+        logger.info("Import job %s: %d rows inserted (%.0f rows/s)", job_id, stats.inserted, stats.rate)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
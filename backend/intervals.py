@@ -0,0 +1,92 @@
+# backend/intervals.py
+"""
+Interval arithmetic on half-open (start, end) pairs.
+
+Everything here works on plain tuples of comparable values (datetimes in
+the app) and is linear in the input size once the input is sorted; the
+initial sort is O(n) for input that already is (Timsort).
+"""
+import heapq
+from itertools import groupby
+
+
+def merge(intervals):
+    """Sort and coalesce overlapping or touching intervals; drops empty ones."""
+    out = []
+    for s, e in sorted(intervals):
+        if s >= e:
+            continue
+        if out and s <= out[-1][1]:
+            if e > out[-1][1]:
+                out[-1] = (out[-1][0], e)
+        else:
+            out.append((s, e))
+    return out
+
+
+def sweep(interval_lists):
+    """
+    Sweep over k interval lists at once and yield (start, end, count)
+    segments, where count is how many lists cover that segment (> 0).
+    Segments are the raw stretches between consecutive boundaries at which
+    the count changes, nothing is merged: touching segments always differ
+    in count (at_least() merges those that pass a quorum).
+    Each list is normalized first, so overlapping intervals from the same
+    list count once. O(N log k) for N intervals in total.
+    """
+    def boundaries(intervals):
+        for s, e in merge(intervals):
+            yield s, 1
+            yield e, -1
+
+    events = heapq.merge(*(boundaries(lst) for lst in interval_lists))
+    count, prev = 0, None
+    for t, group in groupby(events, key=lambda ev: ev[0]):
+        delta = sum(d for _, d in group)
+        if not delta:
+            # one interval ends where another starts: same segment continues
+            continue
+        if count:
+            yield prev, t, count
+        count += delta
+        prev = t
+
+
+def at_least(interval_lists, quorum):
+    """Merged windows covered by at least `quorum` of the lists."""
+    out = []
+    for s, e, n in sweep(interval_lists):
+        if n < quorum:
+            continue
+        if out and out[-1][1] == s:
+            out[-1] = (out[-1][0], e)
+        else:
+            out.append((s, e))
+    return out
+
+
+def intersect_all(interval_lists):
+    """Windows covered by every list (k-way intersection)."""
+    interval_lists = list(interval_lists)
+    if not interval_lists:
+        return []
+    return at_least(interval_lists, len(interval_lists))
+
+
+def subtract(intervals, removals):
+    """Parts of `intervals` not covered by any of `removals`."""
+    cuts = merge(removals)
+    out = []
+    j = 0
+    for s, e in merge(intervals):
+        while j < len(cuts) and cuts[j][1] <= s:
+            j += 1
+        cur, k = s, j
+        while k < len(cuts) and cuts[k][0] < e:
+            if cuts[k][0] > cur:
+                out.append((cur, cuts[k][0]))
+            cur = max(cur, cuts[k][1])
+            k += 1
+        if cur < e:
+            out.append((cur, e))
+    return out
@@ -0,0 +1,146 @@
+# backend/members.py
+"""
+Bulk group membership and project participation changes.
+
+Each change is one statement: INSERT ... SELECT ... ON CONFLICT DO NOTHING
+for additions (existing rows and unknown users are skipped instead of
+failing the whole batch) and DELETE ... WHERE user_id IN (...) for
+removals, both with RETURNING so callers learn which ids actually changed.
+Derived data (bitmaps, cache versions, feasibility) is refreshed in the
+caller's transaction.
+"""
+import os
+
+from sqlalchemy import delete, exists, literal, select
+
+from backend import bitmaps, feasibility
+from backend.models import Membership, Participation, Project, User
+
+MAX_BULK_USERS = int(os.getenv("MAX_BULK_USERS", "5000"))
+
+
+def parse_user_ids(payload):
+    """The de-duplicated user ids of a {"user_ids": [...]} body; ValueError if malformed."""
+    ids = (payload or {}).get("user_ids") if isinstance(payload, dict) else None
+    if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+        raise ValueError("Body must be {\"user_ids\": [<int>, ...]}")
+    if len(ids) > MAX_BULK_USERS:
+        raise ValueError(f"At most {MAX_BULK_USERS} user ids per request")
+    return sorted(set(ids))
+
+
+def _insert(db):
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+# ---------- group membership ----------
+def add_members(db, group_id, user_ids):
+    """Add existing users to the group; returns the ids that were not members yet."""
+    if not user_ids:
+        return []
+    insert = _insert(db)
+    rows = select(User.user_id, literal(group_id)).where(User.user_id.in_(user_ids))
+    added = db.execute(
+        insert(Membership)
+          .from_select(["user_id", "group_id"], rows)
+          .on_conflict_do_nothing(index_elements=["user_id", "group_id"])
+          .returning(Membership.user_id)
+    ).scalars().all()
+    if added:
+        _group_changed(db, group_id, added)
+    return sorted(added)
+
+
+def remove_members(db, group_id, user_ids):
+    """
+    Remove users from the group, and from the group's projects they took
+    part in; returns the ids that were members.
+    """
+    if not user_ids:
+        return []
+    removed = db.execute(
+        delete(Membership)
+          .where(Membership.group_id == group_id, Membership.user_id.in_(user_ids))
+          .returning(Membership.user_id)
+    ).scalars().all()
+    if not removed:
+        return []
+    group_projects = select(Project.project_id).where(Project.group_id == group_id)
+    left = sorted({pid for pid, in db.query(Participation.project_id).filter(
+        Participation.project_id.in_(group_projects), Participation.user_id.in_(removed)
+    )})
+    if left:
+        before = bitmaps.attendees_of(db, left)
+        db.execute(
+            delete(Participation)
+              .where(Participation.project_id.in_(left), Participation.user_id.in_(removed))
+        )
+        bitmaps.refresh_projects(db, left, also=before)
+        feasibility.compute(db, left)
+    _group_changed(db, group_id, removed)
+    return sorted(removed)
+
+
+def _group_changed(db, group_id, user_ids):
+    # projects without explicit participants take the whole group's time
+    pids = [pid for pid, in db.query(Project.project_id).filter(
+        Project.group_id == group_id,
+        ~exists().where(Participation.project_id == Project.project_id)
+    )]
+    if pids:
+        days = bitmaps.session_days(db, pids)
+        if days:
+            bitmaps.refresh(db, user_ids, days)
+        feasibility.compute(db, pids)
+
+
+# ---------- project participation ----------
+def add_participants(db, project_id, group_id, user_ids):
+    """
+    Sign members of the project's group up for it; returns the ids that
+    were added. Users outside the group are skipped.
+    """
+    if not user_ids:
+        return []
+    insert = _insert(db)
+    before = bitmaps.attendees_of(db, [project_id])
+    rows = (
+        select(Membership.user_id, literal(project_id))
+          .where(Membership.group_id == group_id, Membership.user_id.in_(user_ids))
+    )
+    added = db.execute(
+        insert(Participation)
+          .from_select(["user_id", "project_id"], rows)
+          .on_conflict_do_nothing(index_elements=["user_id", "project_id"])
+          .returning(Participation.user_id)
+    ).scalars().all()
+    if added:
+        _participation_changed(db, project_id, before)
+    return sorted(added)
+
+
+def remove_participants(db, project_id, user_ids):
+    """Drop users from the project; returns the ids that were participating."""
+    if not user_ids:
+        return []
+    before = bitmaps.attendees_of(db, [project_id])
+    removed = db.execute(
+        delete(Participation)
+          .where(Participation.project_id == project_id, Participation.user_id.in_(user_ids))
+          .returning(Participation.user_id)
+    ).scalars().all()
+    if removed:
+        _participation_changed(db, project_id, before)
+    return sorted(removed)
+
+
+def _participation_changed(db, project_id, before):
+    # the project's sessions move between the old and new attendees; the
+    # first participant or the last one leaving switches from or to the
+    # whole group
+    bitmaps.refresh_projects(db, [project_id], also=before)
+    feasibility.compute(db, [project_id])
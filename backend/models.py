@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, Integer, BigInteger, Text, TIMESTAMP, Date, LargeBinary, Float, Boolean, ForeignKey, UniqueConstraint, func
 from sqlalchemy.orm import relationship
 from backend.db import Base
 
@@ -12,7 +12,9 @@ class User(Base):
     memberships    = relationship("Membership",    back_populates="user", cascade="all, delete-orphan")
     participation  = relationship("Participation", back_populates="user", cascade="all, delete-orphan")
     busy_times     = relationship("BusyTime",       back_populates="user", cascade="all, delete-orphan")
+    busy_series    = relationship("BusySeries",     back_populates="user", cascade="all, delete-orphan")
     availabilities = relationship("Availability",   back_populates="user", cascade="all, delete-orphan")
+    day_bitmaps    = relationship("DayBitmap",      back_populates="user", cascade="all, delete-orphan")
 
 class Group(Base):
     __tablename__ = "groups"
@@ -69,9 +71,43 @@ class BusyTime(Base):
     end_time     = Column(TIMESTAMP, nullable=False)
     description  = Column(Text)
     calendar_id  = Column(Text, default="default")
+    uid           = Column(Text)
+    recurrence_id = Column(TIMESTAMP)
+    content_hash  = Column(Text)
 
     user = relationship("User", back_populates="busy_times")
 
+class BusySeries(Base):
+    __tablename__ = "busy_series"
+    series_id    = Column(Integer, primary_key=True, index=True)
+    user_id      = Column(Integer, ForeignKey("users.user_id"))
+    calendar_id  = Column(Text, default="default")
+    uid          = Column(Text, nullable=False)
+    start_time   = Column(TIMESTAMP, nullable=False)
+    end_time     = Column(TIMESTAMP, nullable=False)
+    tzid         = Column(Text)
+    rrule        = Column(Text, nullable=False)
+    exdates      = Column(Text)
+    until_time   = Column(TIMESTAMP)
+    description  = Column(Text)
+    content_hash = Column(Text)
+
+    user = relationship("User", back_populates="busy_series")
+
+class DayBitmap(Base):
+    __tablename__ = "day_bitmaps"
+    user_id = Column(Integer, ForeignKey("users.user_id"), primary_key=True)
+    day     = Column(Date, primary_key=True)
+    free    = Column(LargeBinary, nullable=False)
+    busy    = Column(LargeBinary, nullable=False)
+
+    user = relationship("User", back_populates="day_bitmaps")
+
+class UserVersion(Base):
+    __tablename__ = "user_versions"
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True)
+    version = Column(BigInteger, nullable=False, default=0)
+
 class WorkSession(Base):
     __tablename__ = "work_sessions"
     session_id = Column(Integer, primary_key=True, index=True)
@@ -80,3 +116,41 @@ class WorkSession(Base):
     end_time   = Column(TIMESTAMP, nullable=False)
 
     project = relationship("Project", back_populates="work_sessions")
+
+class ProjectFeasibility(Base):
+    __tablename__ = "project_feasibility"
+    project_id      = Column(Integer, ForeignKey("projects.project_id", ondelete="CASCADE"), primary_key=True)
+    free_hours      = Column(Float, nullable=False)
+    booked_hours    = Column(Float, nullable=False)
+    remaining_hours = Column(Float, nullable=False)
+    feasible        = Column(Boolean, nullable=False)
+    computed_at     = Column(TIMESTAMP, nullable=False, server_default=func.now())
+
+class ReminderOutbox(Base):
+    __tablename__ = "reminder_outbox"
+    __table_args__ = (UniqueConstraint("project_id", "recipient", "kind"),)
+    outbox_id  = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.project_id", ondelete="CASCADE"), nullable=False)
+    recipient  = Column(Text, nullable=False)
+    kind       = Column(Text, nullable=False)
+    status     = Column(Text, nullable=False, default="pending")
+    attempts   = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text)
+    created_at = Column(TIMESTAMP, nullable=False, server_default=func.now())
+    sent_at    = Column(TIMESTAMP)
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+    job_id          = Column(Integer, primary_key=True, index=True)
+    user_id         = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"))
+    filename        = Column(Text)
+    payload_path    = Column(Text)
+    status          = Column(Text, nullable=False, default="queued")
+    calendars_total = Column(Integer, default=0)
+    calendars_done  = Column(Integer, default=0)
+    rows_inserted   = Column(Integer, default=0)
+    rows_updated    = Column(Integer, default=0)
+    rows_deleted    = Column(Integer, default=0)
+    error           = Column(Text)
+    created_at      = Column(TIMESTAMP, server_default=func.now())
+    finished_at     = Column(TIMESTAMP)
@@ -0,0 +1,98 @@
+# backend/pagination.py
+"""
+Keyset (seek) pagination for the list pages, and streaming CSV exports.
+
+A page is fetched with WHERE (sort columns) > (values of the last row seen)
+ORDER BY the same columns LIMIT size, so every page costs one index range
+scan no matter how deep it is, and rows inserted or deleted meanwhile never
+shift later pages. The position travels as an opaque ?after= token.
+
+Exports iterate the result with yield_per, which on PostgreSQL uses a
+server-side cursor: memory stays at one batch however large the table is.
+"""
+import base64
+import csv
+import io
+import json
+import os
+from collections import namedtuple
+
+from sqlalchemy import tuple_
+
+PAGE_SIZE     = int(os.getenv("LIST_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("LIST_MAX_PAGE_SIZE", "500"))
+EXPORT_BATCH  = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+Page = namedtuple("Page", "items next_token size sort")
+
+
+class BadPageToken(ValueError):
+    pass
+
+
+def encode_token(sort, values):
+    raw = json.dumps([sort, list(values)], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_token(token, sort):
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        token_sort, values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise BadPageToken("invalid page token") from e
+    if token_sort != sort:
+        raise BadPageToken("page token belongs to a different sort order")
+    return values
+
+
+def page_size(args):
+    try:
+        size = int(args.get("size", PAGE_SIZE))
+    except ValueError:
+        raise BadPageToken("size must be an integer")
+    return min(max(size, 1), MAX_PAGE_SIZE)
+
+
+def keyset_page(query, orders, args, default_sort="id"):
+    """
+    One page of `query`. `orders` maps a ?sort= name to the columns it
+    orders by, ending in a unique column (the primary key) so the order is
+    total. Rows must expose those columns as attributes. Raises
+    BadPageToken for malformed ?after= / ?size= / ?sort= values.
+    """
+    sort = args.get("sort", default_sort)
+    if sort not in orders:
+        raise BadPageToken(f"sort must be one of: {', '.join(orders)}")
+    columns = orders[sort]
+    size = page_size(args)
+
+    token = args.get("after")
+    if token:
+        values = decode_token(token, sort)
+        if len(values) != len(columns):
+            raise BadPageToken("invalid page token")
+        query = query.filter(tuple_(*columns) > tuple_(*values))
+
+    rows = query.order_by(*columns).limit(size + 1).all()
+    next_token = None
+    if len(rows) > size:
+        rows = rows[:size]
+        last = rows[-1]
+        next_token = encode_token(sort, [getattr(last, c.key) for c in columns])
+    return Page(rows, next_token, size, sort)
+
+
+def stream_csv(db, stmt, header, batch_size=EXPORT_BATCH):
+    """Yield CSV text for `stmt`, fetched batch_size rows at a time through a server-side cursor."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    result = db.execute(stmt.execution_options(yield_per=batch_size))
+    for batch in result.partitions():
+        writer.writerows(batch)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
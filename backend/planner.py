@@ -0,0 +1,167 @@
+# backend/planner.py
+"""
+Group-wide session planning.
+
+Plans all open projects of a group together so they don't compete for the
+same members' time. Projects are placed earliest deadline first: each takes
+sessions (slots.plan_sessions) from its members' common free slots, minus
+whatever the projects before it already claimed from any of those members.
+A bounded improvement pass then tries to rescue projects that came up short
+by re-planning an earlier project with the short one's options held back.
+Sessions already booked for any project a member attends are read from
+work_sessions and never planned over.
+"""
+import os
+import time
+from datetime import datetime
+
+from backend import bitmaps
+from backend.feasibility import project_members
+from backend.models import Project, WorkSession
+from backend.ranges import overlaps
+from backend.slots import SLOT_MINUTES, horizon, slot_index, slot_time, to_bits, plan_sessions
+
+PLAN_BUDGET_MS     = int(os.getenv("PLAN_TIME_BUDGET_MS", "500"))
+MAX_PLAN_BUDGET_MS = int(os.getenv("PLAN_MAX_TIME_BUDGET_MS", "5000"))
+
+
+def _mask(sessions):
+    bits = 0
+    for a, b in sessions:
+        bits |= ((1 << (b - a)) - 1) << a
+    return bits
+
+
+def _assign(items):
+    """Greedy EDF placement over `items` (already in deadline order)."""
+    taken = {}
+    for it in items:
+        blocked = it["held"]
+        for uid in it["people"]:
+            blocked |= taken.get(uid, 0)
+        it["sessions"] = plan_sessions(it["free"] & ~blocked, it["needed"], bitmaps.SLOTS_PER_DAY)
+        claimed = _mask(it["sessions"])
+        for uid in it["people"]:
+            taken[uid] = taken.get(uid, 0) | claimed
+
+
+def _shortfall(items):
+    """(slots still missing, projects short) – lower is better."""
+    missing = [it["needed"] - sum(b - a for a, b in it["sessions"]) for it in items]
+    return sum(max(m, 0) for m in missing), sum(m > 0 for m in missing)
+
+
+def _improve(items, stop_at):
+    """
+    Hold back a short project's free slots from one earlier project at a
+    time and keep the change if the plan gets better overall. Stops when a
+    full round finds nothing or the time budget runs out.
+    Returns (improvements, budget_exhausted).
+    """
+    best = _shortfall(items)
+    improved = 0
+    changed = True
+    while changed and best[0]:
+        changed = False
+        for i, short in enumerate(items):
+            if sum(b - a for a, b in short["sessions"]) >= short["needed"]:
+                continue
+            for earlier in items[:i]:
+                if time.perf_counter() >= stop_at:
+                    return improved, True
+                if not (earlier["people"] & short["people"]) or not (_mask(earlier["sessions"]) & short["free"]):
+                    continue
+                saved = earlier["held"]
+                earlier["held"] |= short["free"]
+                _assign(items)
+                score = _shortfall(items)
+                if score < best:
+                    best, improved, changed = score, improved + 1, True
+                else:
+                    earlier["held"] = saved
+                    _assign(items)
+    return improved, False
+
+
+def plan_group(db, group_id, now=None, budget_ms=PLAN_BUDGET_MS):
+    """
+    Propose non-conflicting sessions for every open project of the group.
+    Nothing is written; returns a JSON-ready dict.
+    """
+    started = time.perf_counter()
+    now = now or datetime.now()
+
+    projects = (
+        db.query(Project.project_id, Project.group_id, Project.deadline,
+                 Project.estimated_hours_needed, Project.project_name)
+          .filter(Project.group_id == group_id, Project.deadline > now)
+          .order_by(Project.deadline, Project.project_id)
+          .all()
+    )
+    result = {"group_id": group_id, "projects": [], "improvements": 0, "budget_exhausted": False}
+    if not projects:
+        return result
+
+    people = project_members(db, projects)
+    everyone = set().union(*people.values())
+    origin, first, _ = horizon(now, now)
+    last = projects[-1].deadline
+    words = bitmaps.load(db, everyone, origin.date(), last.date())
+
+    # Sessions already booked for any project a member attends (other
+    # groups, past deadlines, this group's) are read directly rather than
+    # trusted to the bitmaps
+    n_total = max(slot_index(origin, last), first)
+    attendees = bitmaps.session_attendees()
+    spans, sessions = {}, {}
+    for uid, s, e in (
+        db.query(attendees.c.user_id, WorkSession.start_time, WorkSession.end_time)
+          .join(WorkSession, WorkSession.project_id == attendees.c.project_id)
+          .filter(attendees.c.user_id.in_(everyone),
+                  overlaps(WorkSession.start_time, WorkSession.end_time, origin, last))
+    ):
+        spans.setdefault(uid, []).append((s, e))
+    taken = {uid: to_bits(v, origin, n_total, partial=True) for uid, v in spans.items()}
+    for pid, s, e in (
+        db.query(WorkSession.project_id, WorkSession.start_time, WorkSession.end_time)
+          .filter(WorkSession.project_id.in_([p.project_id for p in projects]))
+    ):
+        sessions.setdefault(pid, []).append((s, e))
+
+    items = []
+    for p in projects:
+        booked = sessions.get(p.project_id, ())
+        n_slots = max(slot_index(origin, p.deadline), first)
+        free = bitmaps.combine(words, people[p.project_id], origin.date())
+        free &= ((1 << n_slots) - 1) ^ ((1 << first) - 1)
+        free &= ~to_bits(booked, origin, n_slots, partial=True)
+        for uid in people[p.project_id]:
+            free &= ~taken.get(uid, 0)
+        remaining = max((p.estimated_hours_needed or 0)
+                        - sum((e - s).total_seconds() for s, e in booked) / 3600, 0)
+        items.append({
+            "project": p, "people": people[p.project_id], "free": free, "held": 0,
+            "needed": -(-int(remaining * 60) // SLOT_MINUTES), "sessions": [],
+        })
+
+    _assign(items)
+    stop_at = started + min(budget_ms, MAX_PLAN_BUDGET_MS) / 1000
+    result["improvements"], result["budget_exhausted"] = _improve(items, stop_at)
+
+    for it in items:
+        p = it["project"]
+        planned = sum(b - a for a, b in it["sessions"])
+        result["projects"].append({
+            "project_id": p.project_id,
+            "project_name": p.project_name,
+            "deadline": p.deadline.isoformat(),
+            "hours_needed": it["needed"] * SLOT_MINUTES / 60,
+            "hours_planned": planned * SLOT_MINUTES / 60,
+            "feasible": planned >= it["needed"],
+            "sessions": [
+                {"start": slot_time(origin, a).isoformat(), "end": slot_time(origin, b).isoformat()}
+                for a, b in sorted(it["sessions"])
+            ],
+        })
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
@@ -0,0 +1,66 @@
+# backend/ranges.py
+"""
+Time-window helpers.
+
+`overlaps(start_col, end_col, lo, hi)` is `start < hi AND end > lo`: the
+row meets the window, touching at an edge doesn't count, and a zero-length
+row (start == end, e.g. an event without DTEND) counts when it falls
+inside it. On PostgreSQL it compiles to the same test as
+`tsrange(start, end, '[]') && tsrange(lo, hi, '()')` -- a closed row range,
+so zero-length rows aren't empty, against an open window -- which the
+(owner, tsrange(..., '[]')) GiST indexes from migration 011 can answer;
+elsewhere it is the pair of comparisons. Windows are assumed non-empty
+(lo < hi). parse_window() turns a calendar feed's start/end parameters
+into a bounded window.
+"""
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+from sqlalchemy.types import Boolean
+
+
+class overlaps(FunctionElement):
+    type = Boolean()
+    inherit_cache = True
+    name = "overlaps"
+
+
+@compiles(overlaps)
+def _compile_overlaps(element, compiler, **kw):
+    start, end, lo, hi = element.clauses
+    return "(%s)" % compiler.process(and_(start < hi, end > lo), **kw)
+
+
+@compiles(overlaps, "postgresql")
+def _compile_overlaps_pg(element, compiler, **kw):
+    start, end, lo, hi = element.clauses
+    return compiler.process(
+        func.tsrange(start, end, "[]").op("&&")(func.tsrange(lo, hi, "()")), **kw
+    )
+
+
+# ---------- request windows ----------
+DEFAULT_WINDOW_DAYS = int(os.getenv("CALENDAR_DEFAULT_WINDOW_DAYS", "42"))
+MAX_WINDOW_DAYS     = int(os.getenv("CALENDAR_MAX_WINDOW_DAYS", "366"))
+
+
+def _naive(value):
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return dt.astimezone().replace(tzinfo=None) if dt.tzinfo else dt
+
+
+def parse_window(args, now=None):
+    """
+    (start, end) from FullCalendar's `start`/`end` query parameters. Without
+    them the window starts a week before today and spans DEFAULT_WINDOW_DAYS;
+    it is never longer than MAX_WINDOW_DAYS. Raises ValueError on bad input.
+    """
+    today = (now or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    start = _naive(args["start"]) if args.get("start") else today - timedelta(days=7)
+    end   = _naive(args["end"]) if args.get("end") else start + timedelta(days=DEFAULT_WINDOW_DAYS)
+    if end <= start:
+        raise ValueError("end must be after start")
+    return start, min(end, start + timedelta(days=MAX_WINDOW_DAYS))
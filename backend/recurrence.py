@@ -0,0 +1,143 @@
+# backend/recurrence.py
+"""
+Lazy expansion of recurring busy events.
+
+A series is stored once in busy_series and its occurrences are only
+generated for the window a query asks about. Overridden instances
+(RECURRENCE-ID) are ordinary busy_times rows and replace the occurrence
+they point at, just like EXDATEs remove one.
+"""
+import os
+import re
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+from dateutil.rrule import rrulestr
+
+from backend.models import BusySeries, BusyTime
+
+# queries that don't ask for a window see ±HORIZON_DAYS around today
+HORIZON_DAYS = int(os.getenv("RECURRENCE_HORIZON_DAYS", "365"))
+# series_until() gives up after this many occurrences
+UNTIL_MAX_OCCURRENCES = int(os.getenv("RECURRENCE_UNTIL_MAX_OCCURRENCES", "10000"))
+
+_UNTIL_RE = re.compile(r"UNTIL=(\d{8})(?:T(\d{6}))?(Z?)", re.IGNORECASE)
+
+
+def default_window(now=None):
+    now = now or datetime.now()
+    span = timedelta(days=HORIZON_DAYS)
+    return now - span, now + span
+
+
+# ---------- rules ----------
+def _normalize_until(rrule, tz):
+    """dateutil wants UNTIL to be aware exactly when DTSTART is."""
+    def fix(m):
+        day, clock, utc = m.groups()
+        until = datetime.strptime(day + (clock or "235959"), "%Y%m%d%H%M%S")
+        if tz is None and utc:
+            until = until.replace(tzinfo=timezone.utc).astimezone().replace(tzinfo=None)
+            return "UNTIL=" + until.strftime("%Y%m%dT%H%M%S")
+        if tz is not None and not utc:
+            until = until.replace(tzinfo=tz).astimezone(timezone.utc)
+            return "UNTIL=" + until.strftime("%Y%m%dT%H%M%SZ")
+        return m.group(0)
+    return _UNTIL_RE.sub(fix, rrule)
+
+
+def build_rule(start, rrule, tzid):
+    """
+    Return (rule, tz) with the rule anchored at the series' wall-clock start
+    in its own zone, so DST shifts keep e.g. a 10:15 lecture at 10:15.
+    """
+    tz = ZoneInfo(tzid) if tzid else None
+    dtstart = start.astimezone(tz) if tz else start
+    return rrulestr(_normalize_until(rrule, tz), dtstart=dtstart), tz
+
+
+def series_until(start, end, rrule, tzid, now=None):
+    """
+    End of the last occurrence for bounded rules, None for open-ended ones.
+    Rules that run past the recurrence horizon or UNTIL_MAX_OCCURRENCES
+    (e.g. FREQ=SECONDLY with a distant UNTIL) are stored as open-ended
+    too: until_time only pre-filters queries, occurrences() still stops
+    at the rule's own UNTIL/COUNT.
+    """
+    if not re.search(r"(UNTIL|COUNT)=", rrule, re.IGNORECASE):
+        return None
+    rule, tz = build_rule(start, rrule, tzid)
+    horizon_end = default_window(now)[1]
+    if tz:
+        horizon_end = horizon_end.astimezone(tz)
+    last = None
+    for n, occ in enumerate(rule):
+        if n >= UNTIL_MAX_OCCURRENCES or occ > horizon_end:
+            return None
+        last = occ
+    if last is None:
+        return start
+    if tz:
+        last = last.astimezone().replace(tzinfo=None)
+    return last + (end - start)
+
+
+def format_exdates(dts):
+    return "\n".join(dt.isoformat() for dt in dts) or None
+
+
+def parse_exdates(text):
+    return {datetime.fromisoformat(v) for v in (text or "").split("\n") if v}
+
+
+# ---------- expansion ----------
+def occurrences(series, window_start, window_end, skip=()):
+    """
+    Yield server-local (start, end) pairs of `series` that overlap
+    [window_start, window_end), leaving out EXDATEs and `skip`.
+    """
+    duration = series.end_time - series.start_time
+    rule, tz = build_rule(series.start_time, series.rrule, series.tzid)
+    lo, hi = window_start - duration, window_end
+    if tz:
+        lo, hi = lo.astimezone(tz), hi.astimezone(tz)
+    excluded = parse_exdates(series.exdates) | set(skip)
+
+    for occ in rule.xafter(lo, inc=True):
+        if occ >= hi:
+            break
+        start = occ.astimezone().replace(tzinfo=None) if tz else occ
+        if start in excluded:
+            continue
+        end = start + duration
+        if end > window_start or start >= window_start:
+            yield start, end
+
+
+def expand_series(db, user_ids, window_start, window_end):
+    """Yield (user_id, start, end, description) for every series occurrence in the window."""
+    series = (
+        db.query(BusySeries)
+          .filter(
+              BusySeries.user_id.in_(user_ids),
+              BusySeries.start_time < window_end,
+              (BusySeries.until_time.is_(None)) | (BusySeries.until_time > window_start),
+          )
+          .all()
+    )
+    if not series:
+        return
+
+    # overridden instances replace the occurrence they were moved from
+    overrides = {}
+    for uid_, cal, uid, rid in (
+        db.query(BusyTime.user_id, BusyTime.calendar_id, BusyTime.uid, BusyTime.recurrence_id)
+          .filter(BusyTime.user_id.in_(user_ids), BusyTime.recurrence_id.isnot(None))
+          .all()
+    ):
+        overrides.setdefault((uid_, cal, uid), set()).add(rid)
+
+    for s in series:
+        skip = overrides.get((s.user_id, s.calendar_id, s.uid), ())
+        for start, end in occurrences(s, window_start, window_end, skip):
+            yield s.user_id, start, end, s.description
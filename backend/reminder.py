@@ -1,83 +1,275 @@
 # backend/reminder.py
+"""
+Deadline reminders.
+
+Due reminders are queued in reminder_outbox by one INSERT ... SELECT whose
+unique key (project, recipient, kind) drops anything already queued, so
+every reminder is sent once no matter how often or in how many processes
+the job runs. The queue is drained in batches claimed with FOR UPDATE SKIP
+LOCKED; messages go out through a few persistent SMTP sessions
+(SMTP_WORKERS threads, one connection each) with retries on transient
+failures.
+
+To try it against a local debugging server:
+
+    python -m aiosmtpd -n -l localhost:1025
+    EMAIL_HOST=localhost EMAIL_PORT=1025 EMAIL_STARTTLS=false python -m backend.reminder
+"""
+import logging
 import os
+import queue
 import smtplib
+import threading
+import time
 from email.message import EmailMessage
 from datetime import datetime, timedelta
 
+from sqlalchemy import exists, literal, select, union_all
+
 from backend.db import SessionLocal
-from backend.models import Project, Participation, Membership, User
+from backend.models import Project, Participation, Membership, User, ReminderOutbox
+
+logger = logging.getLogger(__name__)
 
 # ---------- config from .env (optional) -------------------------------------
 SMTP_HOST = os.getenv("EMAIL_HOST")
 SMTP_PORT = int(os.getenv("EMAIL_PORT", "587"))
 SMTP_USER = os.getenv("EMAIL_USER")
 SMTP_PASS = os.getenv("EMAIL_PASSWORD")
-EMAIL_FROM = os.getenv("EMAIL_FROM", SMTP_USER)
+SMTP_STARTTLS = os.getenv("EMAIL_STARTTLS", "true").lower() not in ("0", "false", "no")
+EMAIL_FROM = os.getenv("EMAIL_FROM", SMTP_USER or "collabtool@localhost")
+
+SMTP_WORKERS     = int(os.getenv("SMTP_WORKERS", "4"))
+SMTP_RETRIES     = int(os.getenv("SMTP_RETRIES", "3"))
+SMTP_RETRY_DELAY = float(os.getenv("SMTP_RETRY_DELAY", "1.0"))
+SMTP_TIMEOUT     = float(os.getenv("SMTP_TIMEOUT", "30"))
+
+OUTBOX_BATCH        = int(os.getenv("REMINDER_OUTBOX_BATCH", "200"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("REMINDER_MAX_ATTEMPTS", "5"))
+
+KIND_DEADLINE = "deadline_24h"
+
+
+# ---------- SMTP sessions ----------
+def _transient(e):
+    """Connection problems and 4xx replies are worth another try; 5xx are not."""
+    if isinstance(e, smtplib.SMTPResponseException):
+        return 400 <= e.smtp_code < 500
+    return isinstance(e, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, OSError))
+
+
+class SmtpSession:
+    """One persistent SMTP connection, (re)opened on demand."""
+
+    def __init__(self):
+        self.smtp = None
+
+    def connect(self):
+        self.smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+        if SMTP_STARTTLS:
+            self.smtp.starttls()
+        if SMTP_USER and SMTP_PASS:
+            self.smtp.login(SMTP_USER, SMTP_PASS)
+
+    def close(self):
+        if self.smtp is not None:
+            try:
+                self.smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.smtp = None
+
+    def send(self, msg):
+        for attempt in range(1, SMTP_RETRIES + 1):
+            try:
+                if self.smtp is None:
+                    self.connect()
+                self.smtp.send_message(msg)
+                return
+            except (smtplib.SMTPException, OSError) as e:
+                self.close()
+                if attempt == SMTP_RETRIES or not _transient(e):
+                    raise
+                logger.warning("SMTP send to %s failed (%s), retrying", msg["To"], e)
+                time.sleep(SMTP_RETRY_DELAY * attempt)
+
+
+def make_message(to_addr, subject, body):
+    msg = EmailMessage()
+    msg["From"] = EMAIL_FROM
+    msg["To"] = to_addr
+    msg["Subject"] = subject
+    msg.set_content(body)
+    return msg
+
+
+def send_all(messages, workers=SMTP_WORKERS):
+    """
+    Deliver EmailMessages over at most `workers` concurrent SMTP sessions.
+    Returns (errors, seconds) where errors[i] is None if messages[i] went
+    out, else the error text. Without EMAIL_HOST they are printed.
+    """
+    started = time.perf_counter()
+    errors = [None] * len(messages)
+    if not SMTP_HOST:
+        for msg in messages:
+            print(f"[REMINDER] To: {msg['To']}\nSubj: {msg['Subject']}\n{msg.get_content()}\n")
+        return errors, time.perf_counter() - started
+
+    pending = queue.Queue()
+    for i in range(len(messages)):
+        pending.put(i)
+
+    def worker():
+        session = SmtpSession()
+        try:
+            while True:
+                try:
+                    i = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    session.send(messages[i])
+                except (smtplib.SMTPException, OSError) as e:
+                    logger.error("Could not send reminder to %s: %s", messages[i]["To"], e)
+                    errors[i] = str(e) or type(e).__name__
+        finally:
+            session.close()
+
+    threads = [
+        threading.Thread(target=worker, name=f"smtp-{i}", daemon=True)
+        for i in range(max(1, min(workers, len(messages))))
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return errors, time.perf_counter() - started
 
 
 def send_email(to_addr: str, subject: str, body: str):
-    """Send e-mail if SMTP is configured; otherwise print to console."""
-    if SMTP_HOST and SMTP_USER and SMTP_PASS:
-        msg = EmailMessage()
-        msg["From"] = EMAIL_FROM
-        msg["To"] = to_addr
-        msg["Subject"] = subject
-        msg.set_content(body)
-
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT) as smtp:
-            smtp.starttls()
-            smtp.login(SMTP_USER, SMTP_PASS)
-            smtp.send_message(msg)
+    """Send a single e-mail if SMTP is configured; otherwise print to console."""
+    send_all([make_message(to_addr, subject, body)], workers=1)
+
+
+# ---------- outbox ----------
+def _due_select(lower, upper):
+    """(project_id, email) of everyone to remind about projects due in [lower, upper]."""
+    due = Project.deadline.between(lower, upper)
+    participants = (
+        select(Project.project_id, User.email)
+          .join(Participation, Participation.project_id == Project.project_id)
+          .join(User, User.user_id == Participation.user_id)
+          .where(due)
+    )
+    group = (
+        select(Project.project_id, User.email)
+          .join(Membership, Membership.group_id == Project.group_id)
+          .join(User, User.user_id == Membership.user_id)
+          .where(due, ~exists().where(Participation.project_id == Project.project_id))
+    )
+    return union_all(participants, group).subquery()
+
+
+def enqueue_due(db, lower, upper, kind=KIND_DEADLINE):
+    """
+    Queue one `kind` reminder per (project, recipient) due in [lower, upper]
+    with a single INSERT ... SELECT. Pairs already in the outbox, sent or
+    not, are skipped by the unique key, so overlapping windows and
+    concurrent schedulers never queue a reminder twice.
+    Returns the number of new rows.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
     else:
-        print(f"[REMINDER] To: {to_addr}\nSubj: {subject}\n{body}\n")
+        from sqlalchemy.dialects.sqlite import insert
+
+    due = _due_select(lower, upper)
+    rows = select(due.c.project_id, due.c.email, literal(kind)).distinct()
+    stmt = (
+        insert(ReminderOutbox)
+          .from_select(["project_id", "recipient", "kind"], rows)
+          .on_conflict_do_nothing(index_elements=["project_id", "recipient", "kind"])
+    )
+    return db.execute(stmt).rowcount
+
+
+def _message(recipient, pname, ddl):
+    subject = f"[CollabTool] Project '{pname}' deadline in 24 h"
+    body = (
+        f"Reminder: project '{pname}' is due at {ddl}.\n"
+        "Make sure all tasks are wrapped up!"
+    )
+    return make_message(recipient, subject, body)
 
 
+def drain_outbox(batch_size=OUTBOX_BATCH):
+    """
+    Send pending outbox rows, `batch_size` at a time. Each batch is claimed
+    with SELECT ... FOR UPDATE SKIP LOCKED and marked in the same
+    transaction, so parallel drains split the work instead of doubling it.
+    Failed rows stay pending until OUTBOX_MAX_ATTEMPTS is reached.
+    Returns (sent, failed, seconds).
+    """
+    sent = failed = 0
+    seconds = 0.0
+    after = 0   # rows that failed in this run are retried on the next one
+    while True:
+        with SessionLocal() as db:
+            rows = (
+                db.query(ReminderOutbox.outbox_id, ReminderOutbox.recipient,
+                         ReminderOutbox.attempts, Project.project_name, Project.deadline)
+                  .join(Project, Project.project_id == ReminderOutbox.project_id)
+                  .filter(ReminderOutbox.status == "pending", ReminderOutbox.outbox_id > after)
+                  .order_by(ReminderOutbox.outbox_id)
+                  .limit(batch_size)
+                  .with_for_update(of=ReminderOutbox, skip_locked=True)
+                  .all()
+            )
+            if not rows:
+                break
+            after = rows[-1].outbox_id
+
+            errors, took = send_all([_message(r.recipient, r.project_name, r.deadline) for r in rows])
+            seconds += took
+            now = datetime.utcnow()
+            done = [r.outbox_id for r, err in zip(rows, errors) if err is None]
+            if done:
+                (db.query(ReminderOutbox)
+                   .filter(ReminderOutbox.outbox_id.in_(done))
+                   .update({"status": "sent", "sent_at": now, "attempts": ReminderOutbox.attempts + 1},
+                           synchronize_session=False))
+            for r, err in zip(rows, errors):
+                if err is None:
+                    continue
+                (db.query(ReminderOutbox)
+                   .filter(ReminderOutbox.outbox_id == r.outbox_id)
+                   .update({"attempts": r.attempts + 1, "last_error": err[:500],
+                            "status": "failed" if r.attempts + 1 >= OUTBOX_MAX_ATTEMPTS else "pending"},
+                           synchronize_session=False))
+            db.commit()
+            sent += len(done)
+            failed += len(rows) - len(done)
+    return sent, failed, seconds
+
+
+# ---------- job ----------
 def deadline_reminder_job():
-    """Find projects with deadline < 24 h and notify participants."""
+    """Queue reminders for projects with deadline < 24 h, then send the queue."""
     now = datetime.utcnow()
     upper = now + timedelta(hours=24)
 
     with SessionLocal() as db:
-        # projects nearing deadline
-        projects = (
-            db.query(
-                Project.project_id,
-                Project.project_name,
-                Project.deadline,
-                Project.group_id,
-            )
-            .filter(Project.deadline.between(now, upper))
-            .all()
-        )
-
-        for pid, pname, ddl, gid in projects:
-            # collect participant emails
-            emails = [
-                email
-                for (email,) in (
-                    db.query(User.email)
-                    .join(Participation, Participation.user_id == User.user_id)
-                    .filter(Participation.project_id == pid)
-                    .all()
-                )
-            ]
-
-            # fall back to whole group if no direct participants
-            if not emails:
-                emails = [
-                    email
-                    for (email,) in (
-                        db.query(User.email)
-                        .join(Membership, Membership.user_id == User.user_id)
-                        .filter(Membership.group_id == gid)
-                        .all()
-                    )
-                ]
-
-            subject = f"[CollabTool] Project '{pname}' deadline in 24 h"
-            body = (
-                f"Reminder: project '{pname}' is due at {ddl}.\n"
-                "Make sure all tasks are wrapped up!"
-            )
-            for mail in emails:
-                send_email(mail, subject, body)
+        queued = enqueue_due(db, now, upper)
+        db.commit()
+
+    sent, failed, seconds = drain_outbox()
+    if queued or sent or failed:
+        logger.info("Deadline reminders: %d queued, %d sent, %d failed in %.2fs (%.1f msgs/s)",
+                    queued, sent, failed, seconds, sent / seconds if seconds else 0.0)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    deadline_reminder_job()
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from datetime import datetime
-from backend.db import SessionLocal
+from backend.db import get_db
 from backend.models import Availability
+from backend.calendar_sync import days_spanned
+from backend import bitmaps
 
 bp = Blueprint("availability_api", __name__, url_prefix="/availability/api")
 
@@ -12,11 +14,15 @@ def create_avail():
     user_id = int(data["user_id"])
     start   = datetime.fromisoformat(data["start"])
     end     = datetime.fromisoformat(data["end"])
-    with SessionLocal() as db:
-        av = Availability(user_id=user_id, start_time=start, end_time=end, source="manual")
-        db.add(av)
-        db.commit()
-        new_id = av.availability_id
+    if end < start:
+        return jsonify({"error": "end must not be before start"}), 400
+    db = get_db()
+    av = Availability(user_id=user_id, start_time=start, end_time=end, source="manual")
+    db.add(av)
+    db.flush()
+    bitmaps.refresh(db, [user_id], days_spanned(start, end))
+    db.commit()
+    new_id = av.availability_id
     return jsonify({"id": new_id}), 201
 
 # ---------- UPDATE AVAILABILITY ----------
@@ -25,34 +31,41 @@ def update_avail(availability_id):
     data  = request.get_json(force=True)
     start = datetime.fromisoformat(data["start"])
     end   = datetime.fromisoformat(data["end"])
-    with SessionLocal() as db:
-        av = db.query(Availability).filter(Availability.availability_id == availability_id).first()
-        if av:
-            av.start_time = start
-            av.end_time   = end
-            db.commit()
+    if end < start:
+        return jsonify({"error": "end must not be before start"}), 400
+    db = get_db()
+    av = db.query(Availability).filter(Availability.availability_id == availability_id).first()
+    if av:
+        days = set(days_spanned(av.start_time, av.end_time)) | set(days_spanned(start, end))
+        av.start_time = start
+        av.end_time   = end
+        db.flush()
+        bitmaps.refresh(db, [av.user_id], days)
+        db.commit()
     return "", 204
 
 # ---------- DELETE AVAILABILITY ----------
 @bp.route("/<int:availability_id>", methods=["DELETE"])
 def delete_avail(availability_id):
-    with SessionLocal() as db:
-        av = db.query(Availability).filter(Availability.availability_id == availability_id).first()
-        if av:
-            db.delete(av)
-            db.commit()
+    db = get_db()
+    av = db.query(Availability).filter(Availability.availability_id == availability_id).first()
+    if av:
+        db.delete(av)
+        db.flush()
+        bitmaps.refresh(db, [av.user_id], days_spanned(av.start_time, av.end_time))
+        db.commit()
     return "", 204
 
 # (Optional) if you want a GET endpoint for debugging:
 @bp.route("/<int:user_id>", methods=["GET"])
 def list_user_avails(user_id):
-    with SessionLocal() as db:
-        rows = (
-            db.query(Availability.availability_id, Availability.start_time, Availability.end_time, Availability.source)
-              .filter(Availability.user_id == user_id)
-              .order_by(Availability.start_time)
-              .all()
-        )
+    db = get_db()
+    rows = (
+        db.query(Availability.availability_id, Availability.start_time, Availability.end_time, Availability.source)
+          .filter(Availability.user_id == user_id)
+          .order_by(Availability.start_time)
+          .all()
+    )
     avails = [
         {"id": aid, "start": s.isoformat(), "end": e.isoformat(), "source": src}
         for aid, s, e, src in rows
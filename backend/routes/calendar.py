@@ -1,6 +1,11 @@
-from flask import Blueprint, render_template_string, jsonify
-from backend.db import SessionLocal
+import json
+
+from flask import Blueprint, Response, render_template_string, jsonify, request
+from sqlalchemy import text
+from backend.db import get_db, replica_reads
 from backend.models import Availability, BusyTime, Participation, Project, WorkSession, Membership
+from backend.recurrence import expand_series
+from backend.ranges import overlaps, parse_window
 
 bp = Blueprint("calendar", __name__, url_prefix="/calendar")
 
@@ -24,18 +29,23 @@ def view_calendar(user_id):
       <a href="/users/">Back to users</a>
 
       <script>
-        document.addEventListener('DOMContentLoaded', async () => {
-          const res = await fetch('/calendar/api/{{ user_id }}');
-          const raw  = await res.json();
-          const events = raw.map(ev => ({
-              title: `${ev.type}: ${ev.description || ''}`,
-              start: ev.start,
-              end:   ev.end,
-              color: ev.type === 'Busy'        ? 'red'
-                    : ev.type === 'Available'   ? 'green'
-                    : ev.type === 'Session'     ? 'purple'
-                    : 'blue'
-          }));
+        document.addEventListener('DOMContentLoaded', () => {
+          // FullCalendar calls this with the visible range whenever it changes
+          const events = async (info) => {
+            const params = new URLSearchParams({ start: info.startStr, end: info.endStr });
+            const res = await fetch(`/calendar/api/{{ user_id }}?${params}`);
+            const raw = await res.json();
+            return raw.map(ev => ({
+                title: `${ev.type}: ${ev.description || ''}`,
+                start: ev.start,
+                end:   ev.end,
+                extendedProps: { id: ev.id },
+                color: ev.type === 'Busy'        ? 'red'
+                      : ev.type === 'Available'   ? 'green'
+                      : ev.type === 'Session'     ? 'purple'
+                      : 'blue'
+            }));
+          };
 
           const cal = new FullCalendar.Calendar(
             document.getElementById('calendar'),
@@ -84,28 +94,126 @@ def view_calendar(user_id):
     """, user_id=user_id)
 
 # ---------- JSON API ----------
+# Every stored event kind in one statement, serialized by PostgreSQL; the
+# same shapes as the Python path below builds
+CALENDAR_FEED_SQL = text("""
+    WITH win AS (SELECT tsrange(:lo, :hi, '()') AS r),
+    events AS (
+        SELECT 1 AS kind, a.start_time,
+               json_build_object('type', 'Available', 'id', a.availability_id,
+                                 'start', a.start_time, 'end', a.end_time,
+                                 'description', COALESCE(a.source, '')) AS ev
+        FROM availabilities a, win
+        WHERE a.user_id = :uid AND tsrange(a.start_time, a.end_time, '[]') && win.r
+      UNION ALL
+        SELECT 2, b.start_time,
+               json_build_object('type', 'Busy',
+                                 'start', b.start_time, 'end', b.end_time,
+                                 'description', COALESCE(b.description, ''))
+        FROM busy_times b, win
+        WHERE b.user_id = :uid AND tsrange(b.start_time, b.end_time, '[]') && win.r
+      UNION ALL
+        SELECT 3, p.deadline,
+               json_build_object('type', 'Project',
+                                 'start', p.deadline, 'end', p.deadline,
+                                 'description', format('%s (est %sh)', p.project_name,
+                                                       COALESCE(p.estimated_hours_needed::text, 'None')))
+        FROM projects p
+        JOIN participation pa ON pa.project_id = p.project_id
+        WHERE pa.user_id = :uid AND p.deadline >= :lo AND p.deadline < :hi
+      UNION ALL
+        -- sessions of projects the user takes part in or whose group they're in
+        SELECT 4, w.start_time,
+               json_build_object('type', 'Session', 'id', w.session_id,
+                                 'start', w.start_time, 'end', w.end_time,
+                                 'description', p.project_name)
+        FROM work_sessions w
+        JOIN projects p ON p.project_id = w.project_id, win
+        WHERE tsrange(w.start_time, w.end_time, '[]') && win.r
+          AND (EXISTS (SELECT 1 FROM participation pa
+                       WHERE pa.project_id = p.project_id AND pa.user_id = :uid)
+               OR p.group_id IN (SELECT m.group_id FROM memberships m WHERE m.user_id = :uid))
+    )
+    SELECT COALESCE((SELECT json_agg(ev ORDER BY kind, start_time) FROM events)::text, '[]'),
+           EXISTS (SELECT 1 FROM busy_series s
+                   WHERE s.user_id = :uid AND s.start_time < :hi
+                     AND (s.until_time IS NULL OR s.until_time > :lo))
+""")
+
+
+def calendar_feed_json(db, user_id, lo, hi):
+    """The calendar feed as JSON text, built by PostgreSQL in one round trip."""
+    body, has_series = db.execute(CALENDAR_FEED_SQL, {"uid": user_id, "lo": lo, "hi": hi}).one()
+    if not has_series:
+        return body
+
+    # recurring events are expanded in Python and spliced into the array
+    series = json.dumps([
+        {"type": "Busy", "start": s.isoformat(), "end": e.isoformat(), "description": d or ""}
+        for _, s, e, d in expand_series(db, [user_id], lo, hi)
+    ])
+    if series == "[]":
+        return body
+    if body == "[]":
+        return series
+    return body[:-1] + ", " + series[1:]
+
+
 @bp.route("/api/<int:user_id>")
+@replica_reads
 def calendar_api(user_id):
-    with SessionLocal() as db:
-        avail_rows = (
-            db.query(Availability.availability_id, Availability.start_time, Availability.end_time, Availability.source)
-              .filter(Availability.user_id == user_id)
-              .all()
-        )
-        busy_rows = (
-            db.query(BusyTime.start_time, BusyTime.end_time, BusyTime.description)
-              .filter(BusyTime.user_id == user_id)
-              .all()
-        )
-        proj_rows = (
-            db.query(Project.project_name, Project.deadline, Project.estimated_hours_needed)
-              .join(Participation, Participation.project_id == Project.project_id)
-              .filter(Participation.user_id == user_id)
-              .all()
+    # only the visible range FullCalendar asks for (?start=&end=)
+    try:
+        lo, hi = parse_window(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    db = get_db()
+    if db.get_bind().dialect.name == "postgresql":
+        return Response(calendar_feed_json(db, user_id, lo, hi), mimetype="application/json")
+
+    avail_rows = (
+        db.query(Availability.availability_id, Availability.start_time, Availability.end_time, Availability.source)
+          .filter(Availability.user_id == user_id,
+                  overlaps(Availability.start_time, Availability.end_time, lo, hi))
+          .all()
+    )
+    busy_rows = (
+        db.query(BusyTime.start_time, BusyTime.end_time, BusyTime.description)
+          .filter(BusyTime.user_id == user_id,
+                  overlaps(BusyTime.start_time, BusyTime.end_time, lo, hi))
+          .all()
+    )
+    # recurring events are expanded on the fly for the window
+    busy_rows += [(s, e, d) for _, s, e, d in expand_series(db, [user_id], lo, hi)]
+    proj_rows = (
+        db.query(Project.project_name, Project.deadline, Project.estimated_hours_needed)
+          .join(Participation, Participation.project_id == Project.project_id)
+          .filter(Participation.user_id == user_id,
+                  Project.deadline >= lo, Project.deadline < hi)
+          .all()
+    )
+
+    # Sessions: either directly participating or via group membership
+    part_sessions = (
+        db.query(
+            WorkSession.session_id,
+            WorkSession.start_time,
+            WorkSession.end_time,
+            Project.project_name
         )
+        .join(Project, Project.project_id == WorkSession.project_id)
+        .join(Participation, Participation.project_id == Project.project_id)
+        .filter(Participation.user_id == user_id,
+                overlaps(WorkSession.start_time, WorkSession.end_time, lo, hi))
+    )
 
-        # Sessions: either directly participating or via group membership
-        part_sessions = (
+    group_ids = [r[0] for r in
+        db.query(Membership.group_id).filter(Membership.user_id == user_id).all()
+    ]
+
+    if group_ids:
+        group_sessions = (
             db.query(
                 WorkSession.session_id,
                 WorkSession.start_time,
@@ -113,28 +221,12 @@ def calendar_api(user_id):
                 Project.project_name
             )
             .join(Project, Project.project_id == WorkSession.project_id)
-            .join(Participation, Participation.project_id == Project.project_id)
-            .filter(Participation.user_id == user_id)
+            .filter(Project.group_id.in_(group_ids),
+                    overlaps(WorkSession.start_time, WorkSession.end_time, lo, hi))
         )
-
-        group_ids = [r[0] for r in
-            db.query(Membership.group_id).filter(Membership.user_id == user_id).all()
-        ]
-
-        if group_ids:
-            group_sessions = (
-                db.query(
-                    WorkSession.session_id,
-                    WorkSession.start_time,
-                    WorkSession.end_time,
-                    Project.project_name
-                )
-                .join(Project, Project.project_id == WorkSession.project_id)
-                .filter(Project.group_id.in_(group_ids))
-            )
-            session_rows = part_sessions.union(group_sessions).all()
-        else:
-            session_rows = part_sessions.all()
+        session_rows = part_sessions.union(group_sessions).all()
+    else:
+        session_rows = part_sessions.all()
 
     avail = [
       {
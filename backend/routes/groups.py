@@ -1,15 +1,28 @@
 from flask import Blueprint, request, redirect, render_template, url_for, flash, jsonify
-from backend.db import SessionLocal
-from backend.models import Group, User, Membership, Availability
+from sqlalchemy import exists
+from backend.db import get_db, replica_reads
+from backend.models import Group, User, Membership, Availability, Project
+from backend.intervals import sweep
+from backend.pagination import BadPageToken, keyset_page
+from backend.members import parse_user_ids, add_members, remove_members
+from backend import bitmaps, cache, planner
+from backend.ranges import overlaps, parse_window
 
 bp = Blueprint("groups", __name__, url_prefix="/groups")
 
 # ---------- LIST GROUPS ----------
 @bp.route("/")
 def list_groups():
-    with SessionLocal() as db:
-        groups = db.query(Group.group_id, Group.group_name, Group.description).order_by(Group.group_id).all()
-    return render_template("groups/list.html", groups=groups)
+    db = get_db()
+    try:
+        page = keyset_page(
+            db.query(Group.group_id, Group.group_name, Group.description),
+            {"id": [Group.group_id], "name": [Group.group_name, Group.group_id]},
+            request.args
+        )
+    except BadPageToken as e:
+        return str(e), 400
+    return render_template("groups/list.html", groups=page.items, page=page)
 
 # ---------- CREATE GROUP ----------
 @bp.route("/new", methods=["GET", "POST"])
@@ -17,10 +30,10 @@ def create_group():
     if request.method == "POST":
         name = request.form["group_name"]
         desc = request.form["description"]
-        with SessionLocal() as db:
-            grp = Group(group_name=name, description=desc)
-            db.add(grp)
-            db.commit()
+        db = get_db()
+        grp = Group(group_name=name, description=desc)
+        db.add(grp)
+        db.commit()
         return redirect(url_for("groups.list_groups"))
 
     return render_template("groups/new.html")
@@ -28,15 +41,15 @@ def create_group():
 # ---------- VIEW GROUP & MEMBERS ----------
 @bp.route("/<int:group_id>")
 def view_group(group_id):
-    with SessionLocal() as db:
-        group = db.query(Group.group_name, Group.description).filter(Group.group_id == group_id).first()
-        members = (
-            db.query(User.user_id, User.username)
-              .join(Membership, Membership.user_id == User.user_id)
-              .filter(Membership.group_id == group_id)
-              .order_by(User.username)
-              .all()
-        )
+    db = get_db()
+    group = db.query(Group.group_name, Group.description).filter(Group.group_id == group_id).first()
+    members = (
+        db.query(User.user_id, User.username)
+          .join(Membership, Membership.user_id == User.user_id)
+          .filter(Membership.group_id == group_id)
+          .order_by(User.username)
+          .all()
+    )
     if not group:
         return "Group not found", 404
 
@@ -45,42 +58,79 @@ def view_group(group_id):
 # ---------- ADD MEMBER ----------
 @bp.route("/<int:group_id>/add_member", methods=["GET", "POST"])
 def add_member(group_id):
-    with SessionLocal() as db:
-        if request.method == "POST":
-            uid = int(request.form["user_id"])
-            mem = Membership(group_id=group_id, user_id=uid)
-            db.add(mem)
-            db.commit()
-            return redirect(url_for("groups.view_group", group_id=group_id))
-
-        # Get group name for displaying
-        group = db.query(Group.group_name).filter(Group.group_id == group_id).first()
-        if not group:
-            return "Group not found", 404
+    db = get_db()
+    if request.method == "POST":
+        uid = int(request.form["user_id"])
+        # adding someone who is already a member is a no-op
+        add_members(db, group_id, [uid])
+        db.commit()
+        return redirect(url_for("groups.view_group", group_id=group_id))
+
+    # Get group name for displaying
+    group = db.query(Group.group_name).filter(Group.group_id == group_id).first()
+    if not group:
+        return "Group not found", 404
 
-        # Get users who are not yet members
-        subq = db.query(Membership.user_id).filter(Membership.group_id == group_id).subquery()
-        users = db.query(User.user_id, User.username).filter(
-            ~User.user_id.in_(subq)
-        ).order_by(User.username).all()
+    # Get users who are not yet members, a page at a time, optionally by name prefix
+    users = db.query(User.user_id, User.username).filter(
+        ~exists().where(Membership.group_id == group_id, Membership.user_id == User.user_id)
+    )
+    q = request.args.get("q", "").strip()
+    if q:
+        users = users.filter(User.username.istartswith(q, autoescape=True))
+    try:
+        page = keyset_page(
+            users,
+            {"id": [User.user_id], "name": [User.username, User.user_id]},
+            request.args, default_sort="name"
+        )
+    except BadPageToken as e:
+        return str(e), 400
+
+    return render_template("groups/add_member.html", group=group, users=page.items, page=page, group_id=group_id)
+
+# ---------- MEMBERS (JSON API) ----------
+@bp.route("/api/<int:group_id>/members", methods=["GET", "POST", "DELETE"])
+def group_members_api(group_id):
+    """List, bulk-add or bulk-remove members: body {"user_ids": [...]} for POST/DELETE."""
+    db = get_db()
+    if db.get(Group, group_id) is None:
+        return jsonify({"error": "Group not found"}), 404
+
+    if request.method == "GET":
+        ids = [uid for uid, in db.query(Membership.user_id)
+                                 .filter(Membership.group_id == group_id)
+                                 .order_by(Membership.user_id)]
+        return jsonify({"group_id": group_id, "user_ids": ids})
+
+    try:
+        ids = parse_user_ids(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    return render_template("groups/add_member.html", group=group, users=users, group_id=group_id)
+    if request.method == "POST":
+        changed, key = add_members(db, group_id, ids), "added"
+    else:
+        changed, key = remove_members(db, group_id, ids), "removed"
+    db.commit()
+    # ignored: already (not) members, or no such user
+    return jsonify({"group_id": group_id, key: changed, "ignored": sorted(set(ids) - set(changed))})
 
 # ---------- EDIT GROUP ----------
 @bp.route("/<int:group_id>/edit", methods=["GET", "POST"])
 def edit_group(group_id):
-    with SessionLocal() as db:
-        if request.method == "POST":
-            new_n = request.form["group_name"]
-            new_d = request.form["description"]
-            grp = db.query(Group).filter(Group.group_id == group_id).first()
-            if grp:
-                grp.group_name  = new_n
-                grp.description = new_d
-                db.commit()
-            return redirect(url_for("groups.list_groups"))
-
-        grp = db.query(Group.group_name, Group.description).filter(Group.group_id == group_id).first()
+    db = get_db()
+    if request.method == "POST":
+        new_n = request.form["group_name"]
+        new_d = request.form["description"]
+        grp = db.query(Group).filter(Group.group_id == group_id).first()
+        if grp:
+            grp.group_name  = new_n
+            grp.description = new_d
+            db.commit()
+        return redirect(url_for("groups.list_groups"))
+
+    grp = db.query(Group.group_name, Group.description).filter(Group.group_id == group_id).first()
     if not grp:
         return "Group not found", 404
 
@@ -89,18 +139,25 @@ def edit_group(group_id):
 # ---------- DELETE GROUP ----------
 @bp.route("/<int:group_id>/delete")
 def delete_group(group_id):
-    with SessionLocal() as db:
-        grp = db.query(Group).filter(Group.group_id == group_id).first()
-        if grp:
-            db.delete(grp)
-            db.commit()
+    db = get_db()
+    grp = db.query(Group).filter(Group.group_id == group_id).first()
+    if grp:
+        # the group's projects and their sessions go with it; take the
+        # sessions out of their attendees' bitmaps
+        pids = [pid for pid, in db.query(Project.project_id).filter(Project.group_id == group_id)]
+        members = bitmaps.attendees_of(db, pids) if pids else set()
+        days = bitmaps.session_days(db, pids) if pids else set()
+        db.delete(grp)
+        db.flush()
+        bitmaps.refresh(db, members, days)
+        db.commit()
     return redirect(url_for("groups.list_groups"))
 
 # ---------- GROUP CALENDAR (HTML) ----------
 @bp.route("/<int:group_id>/calendar")
 def group_calendar_view(group_id):
-    with SessionLocal() as db:
-        g = db.query(Group.group_name).filter(Group.group_id == group_id).first()
+    db = get_db()
+    g = db.query(Group.group_name).filter(Group.group_id == group_id).first()
     if not g:
         return "Group not found", 404
 
@@ -108,39 +165,55 @@ def group_calendar_view(group_id):
 
 # ---------- GROUP CALENDAR (JSON API) ----------
 @bp.route("/api/<int:group_id>")
+@replica_reads
 def group_calendar_json(group_id):
-    with SessionLocal() as db:
-        # Get members
-        members = db.query(User.user_id)\
-                    .join(Membership, Membership.user_id == User.user_id)\
-                    .filter(Membership.group_id == group_id)\
-                    .all()
-        member_ids = [m[0] for m in members]
-        
-        if not member_ids:
-            return jsonify([])
-
-        # Get all availabilities for all members
-        avail = (
-            db.query(Availability.start_time, Availability.end_time)
-              .filter(Availability.user_id.in_(member_ids))
-              .order_by(Availability.start_time)
-              .all()
-        )
-
-    # Get overlapping time windows where everyone is available
-    common_slots = []
-    # (this implementation is simplified and could be improved
-    #  to better handle overlapping availability from the same user)
-    
-    # Format for FullCalendar
-    events = []
-    for start, end in avail:
-        events.append({
-            "title": "Available",
-            "start": start.isoformat(),
-            "end": end.isoformat(),
-            "color": "green"
-        })
-
-    return jsonify(events)
+    """
+    Common free time of the group as a heatmap: the sweep's (start, end,
+    free_count) segments, one per stretch of constant count, where at least
+    `quorum` members (default: all of them) are free, inside the
+    ?start=&end= window FullCalendar asks for.
+    """
+    try:
+        lo, hi = parse_window(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    db = get_db()
+    member_ids = [
+        m[0] for m in
+        db.query(Membership.user_id).filter(Membership.group_id == group_id).all()
+    ]
+
+    def heatmap():
+        per = {}
+        if member_ids:
+            for uid, s, e in (
+                db.query(Availability.user_id, Availability.start_time, Availability.end_time)
+                  .filter(Availability.user_id.in_(member_ids),
+                          overlaps(Availability.start_time, Availability.end_time, lo, hi))
+                  .all()
+            ):
+                per.setdefault(uid, []).append((max(s, lo), min(e, hi)))
+        return [[s.isoformat(), e.isoformat(), n] for s, e, n in sweep(per.values())]
+
+    # every quorum is served from the same cached heatmap
+    full = cache.cached(db, ("group-heatmap", group_id), member_ids, heatmap,
+                        window=(lo.isoformat(), hi.isoformat()))
+
+    total = len(member_ids)
+    quorum = request.args.get("quorum", default=total, type=int)
+    quorum = min(max(quorum, 1), total) if total else 0
+
+    segments = [seg for seg in full if seg[2] >= quorum]
+    return jsonify({"members": total, "quorum": quorum, "segments": segments})
+
+# ---------- GROUP SESSION PLAN (JSON API) ----------
+@bp.route("/<int:group_id>/plan")
+def group_plan(group_id):
+    """Proposed non-conflicting sessions for all open projects of the group."""
+    budget = request.args.get("budget_ms", default=planner.PLAN_BUDGET_MS, type=int)
+    db = get_db()
+    if not db.query(Group.group_id).filter(Group.group_id == group_id).first():
+        return jsonify({"error": "Group not found"}), 404
+    plan = planner.plan_group(db, group_id, budget_ms=max(budget, 0))
+    return jsonify(plan)
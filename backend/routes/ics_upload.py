@@ -1,140 +1,337 @@
-from flask import Blueprint, request, render_template_string, redirect, url_for, flash
-from backend.db import SessionLocal
-from backend.models import BusyTime, Availability
-from ics import Calendar
-from datetime import datetime, time as dtime
+from flask import Blueprint, request, render_template_string, url_for, jsonify
+from backend.db import get_db
+from backend.models import BusyTime, Availability, User, ImportJob
+from backend.ics_stream import read_calendar, parse_calendar, calendar_name, IcsParseError
+from backend.import_jobs import submit_import
+from backend.bulk import bulk_insert
+from backend.calendar_sync import sync_calendar, replace_legacy_rows, SyncStats, days_spanned, day_runs
+from backend.recurrence import expand_series, default_window
+from backend.freebusy import use_sql, free_windows
+from backend.intervals import subtract
+from backend import bitmaps
+from backend.ranges import overlaps
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, timedelta, time as dtime
+from sqlalchemy import and_, or_
+import os
+import threading
+import time
+import zipfile
 
 bp = Blueprint("ics_upload", __name__, url_prefix="/ics")
 
+PARSE_WORKERS = int(os.getenv("ICS_PARSE_WORKERS", str(os.cpu_count() or 1)))
+# ZIP uploads: uncompressed size caps per member and per archive, and how
+# many members are decompressed and queued for parsing at a time
+ZIP_MAX_MEMBER_BYTES = int(os.getenv("ICS_ZIP_MAX_MEMBER_BYTES", str(50 * 1024 * 1024)))
+ZIP_MAX_TOTAL_BYTES  = int(os.getenv("ICS_ZIP_MAX_TOTAL_BYTES", str(500 * 1024 * 1024)))
+ZIP_PARSE_AHEAD      = int(os.getenv("ICS_ZIP_PARSE_AHEAD", str(2 * PARSE_WORKERS)))
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
 @bp.route("/upload", methods=["GET", "POST"])
 def upload_ics():
-    with SessionLocal() as db:
-        users = db.query(
-            # list of (user_id, username)
-            # Use direct User import if needed, but here we pass an example to the template.
-            # Let’s import User:
-            __import__("backend.models", fromlist=["User"])
-        )
-    # Actually, do we need the above? Instead:
-    with SessionLocal() as db:
-        users = db.query(BusyTime.user_id).distinct().all()
-        # But we want actual usernames, so:
-        from backend.models import User
-    with SessionLocal() as db:
-        users = db.query(User.user_id, User.username).order_by(User.username).all()
+    db = get_db()
+    users = db.query(User.user_id, User.username).order_by(User.username).all()
 
     if request.method == "POST":
         user_id = int(request.form["user_id"])
-        file    = request.files["icsfile"]
+        file    = request.files.get("icsfile")
         if not file:
-            flash("No file selected")
-            return redirect(request.url)
+            return jsonify({"error": "No file selected"}), 400
 
-        text = file.stream.read().decode("utf-8")
-        try:
-            cal = Calendar(text)
-        except Exception:
-            flash("Invalid .ics file")
-            return redirect(request.url)
-
-        inserted = 0
-        with SessionLocal() as db2:
-            for ev in cal.events:
-                if ev.begin.tzinfo:
-                    start = ev.begin.datetime.astimezone().replace(tzinfo=None)
-                    end   = ev.end.datetime.astimezone().replace(tzinfo=None)
-                else:
-                    start = ev.begin.datetime
-                    end   = ev.end.datetime
-
-                desc = ev.name or ev.description or ""
-                busy = BusyTime(
-                    user_id=user_id,
-                    start_time=start,
-                    end_time=end,
-                    description=desc[:250]
-                )
-                db2.add(busy)
-                inserted += 1
-            db2.commit()
-
-        # After inserting busy_times, compute 08:00–20:00 availability gaps
-        generate_daily_availability(user_id)
-
-        flash(f"Imported {inserted} busy events.")
-        return redirect(url_for("users.list_users"))
+        # Parsing and writing happen in a background job; the request only
+        # stores the payload so its latency doesn't depend on calendar size
+        job_id = submit_import(user_id, file.filename, file.stream)
+        status_url = url_for("ics_upload.import_job_status", job_id=job_id)
+        return jsonify({"job_id": job_id, "status_url": status_url}), 202, {"Location": status_url}
 
     return render_template_string("""
       <h2>Upload .ics for user</h2>
-      <form method="POST" enctype="multipart/form-data">
+      <form id="upload-form" method="POST" enctype="multipart/form-data">
         User:
         <select name="user_id">
           {% for uid, uname in users %}
             <option value="{{ uid }}">{{ uname }}</option>
           {% endfor %}
         </select><br><br>
-        <input type="file" name="icsfile" accept=".ics"><br><br>
+        <input type="file" name="icsfile" accept=".ics,.zip"><br><br>
+        <small>Upload a single .ics or a Google Calendar export (.zip).
+        Re-uploading the same calendar only applies what changed.</small><br><br>
         <button type="submit">Upload</button>
       </form>
+      <p id="import-status"></p>
       <a href="/">Home</a>
+
+      <script>
+        document.getElementById('upload-form').addEventListener('submit', async (e) => {
+          e.preventDefault();
+          const status = document.getElementById('import-status');
+          const res  = await fetch(location.href, { method: 'POST', body: new FormData(e.target) });
+          const body = await res.json();
+          if (res.status !== 202) { status.textContent = body.error; return; }
+
+          const poll = async () => {
+            const job = await (await fetch(body.status_url)).json();
+            status.textContent =
+              `${job.status}: ${job.calendars_done}/${job.calendars_total} calendars, ` +
+              `${job.rows_inserted} new, ${job.rows_updated} changed, ${job.rows_deleted} removed` +
+              (job.error ? ` – ${job.error}` : '');
+            if (job.status === 'queued' || job.status === 'running') setTimeout(poll, 1000);
+          };
+          poll();
+        });
+      </script>
     """, users=users)
 
+# ---------- IMPORT JOB STATUS ----------
+@bp.route("/jobs/<int:job_id>")
+def import_job_status(job_id):
+    db = get_db()
+    job = db.query(ImportJob).filter(ImportJob.job_id == job_id).first()
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    data = {
+        "job_id":          job.job_id,
+        "user_id":         job.user_id,
+        "filename":        job.filename,
+        "status":          job.status,
+        "calendars_total": job.calendars_total,
+        "calendars_done":  job.calendars_done,
+        "rows_inserted":   job.rows_inserted,
+        "rows_updated":    job.rows_updated,
+        "rows_deleted":    job.rows_deleted,
+        "error":           job.error,
+        "created_at":      job.created_at.isoformat() if job.created_at else None,
+        "finished_at":     job.finished_at.isoformat() if job.finished_at else None,
+    }
+    return jsonify(data)
+
+# ---------- helpers: import ----------
+def calendar_id_from_filename(name):
+    return os.path.splitext(os.path.basename(name or ""))[0] or "default"
+
+
+def calendar_id_for(props, filename):
+    """
+    A calendar is identified by its X-WR-RELCALID / X-WR-CALNAME, so a
+    re-upload under another file name still replaces only its own events;
+    the file name is the fallback for calendars that carry neither.
+    """
+    return calendar_name(props) or calendar_id_from_filename(filename)
+
+
+def parse_pool():
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        return _parse_pool
+
+
+def reset_parse_pool(broken):
+    """Drop a broken pool (a worker died) so the next import starts a fresh one."""
+    global _parse_pool
+    with _parse_pool_lock:
+        # another import may already have replaced it
+        if _parse_pool is broken:
+            _parse_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def ics_members(zf):
+    return [
+        n for n in zf.namelist()
+        if n.lower().endswith(".ics") and not n.startswith("__MACOSX/")
+    ]
+
+
+def open_calendars(fp, filename):
+    """Return (count, iterator of (calendar_id, events)) for an .ics or .zip payload."""
+    if zipfile.is_zipfile(fp):
+        fp.seek(0)
+        with zipfile.ZipFile(fp) as zf:
+            count = len(ics_members(zf))
+        fp.seek(0)
+        return count, iter_zip_calendars(fp)
+    fp.seek(0)
+    props, events = read_calendar(fp)
+    return 1, iter([(calendar_id_for(props, filename), events)])
+
+
+def check_zip_sizes(zf, names):
+    """Refuse members (or a whole archive) that would decompress beyond the configured caps."""
+    total = 0
+    for name in names:
+        size = zf.getinfo(name).file_size
+        if size > ZIP_MAX_MEMBER_BYTES:
+            raise IcsParseError(f"{os.path.basename(name)}: {size} bytes uncompressed, "
+                                f"the limit is {ZIP_MAX_MEMBER_BYTES}")
+        total += size
+    if total > ZIP_MAX_TOTAL_BYTES:
+        raise IcsParseError(f"archive is {total} bytes uncompressed, the limit is {ZIP_MAX_TOTAL_BYTES}")
+
+
+def iter_zip_calendars(fp):
+    """
+    Yield (calendar_id, events) for every .ics in a ZIP, parsed concurrently.
+    At most ZIP_PARSE_AHEAD members are decompressed and in flight at once.
+    """
+    with zipfile.ZipFile(fp) as zf:
+        names = ics_members(zf)
+        check_zip_sizes(zf, names)
+        pending = deque()
+        seen = set()
+        todo = iter(names)
+        pool = parse_pool()
+        try:
+            while True:
+                for name in todo:
+                    pending.append((name, pool.submit(parse_calendar, zf.read(name))))
+                    if len(pending) >= ZIP_PARSE_AHEAD:
+                        break
+                if not pending:
+                    return
+                name, fut = pending.popleft()
+                try:
+                    props, events = fut.result()
+                except IcsParseError as e:
+                    raise IcsParseError(f"{os.path.basename(name)}: {e}")
+                calendar_id = calendar_id_for(props, name)
+                # two calendars of one export sharing a name stay apart
+                if calendar_id in seen:
+                    calendar_id = f"{calendar_id}/{calendar_id_from_filename(name)}"
+                seen.add(calendar_id)
+                yield calendar_id, events
+        except BrokenProcessPool:
+            # a parser process died (e.g. killed for memory); the pool is
+            # unusable from now on, so replace it and fail this import
+            reset_parse_pool(pool)
+            raise IcsParseError("a calendar parser process crashed")
+        finally:
+            for _, fut in pending:
+                fut.cancel()
+
+
+def import_calendars(db, user_id, calendars, progress=None):
+    """
+    Sync every (calendar_id, events) pair for one user and refresh the
+    derived availability, all in the caller's transaction. `progress`, if
+    given, is called as progress(calendars_done, SyncStats) after each one.
+    """
+    started = time.perf_counter()
+    # events imported before calendars had identities are replaced
+    legacy_deleted, days = replace_legacy_rows(db, user_id)
+    totals = [0, 0, legacy_deleted, 0]
+    for done, (calendar_id, events) in enumerate(calendars, 1):
+        stats = sync_calendar(db, user_id, calendar_id, events)
+        totals = [t + n for t, n in zip(totals, stats[:4])]
+        days |= stats.days
+        if progress:
+            progress(done, SyncStats(*totals, 0.0))
+
+    # Recompute 08:00–20:00 availability gaps, only for the days that
+    # changed, in the same transaction
+    generate_daily_availability(db, user_id, days)
+    bitmaps.refresh(db, [user_id], days)
+
+    inserted, updated, deleted, unchanged = totals
+    elapsed = time.perf_counter() - started
+    return SyncStats(inserted, updated, deleted, unchanged,
+                     inserted / elapsed if inserted and elapsed else 0.0, frozenset(days))
+
+
 # ---------- helper: derive 08-20 availability each day ----------
-def generate_daily_availability(user_id):
+RUN_CHUNK = 100
+
+
+def generate_daily_availability(db, user_id, days=None):
     """
     For each day that has at least one busy event, insert the gaps between
-    08:00 and 20:00 as Availability rows (source='auto').
+    08:00 and 20:00 as Availability rows (source='auto'). Only `days` are
+    recomputed (every day when None) and their previous auto rows are
+    replaced, all in the caller's transaction. With FREEBUSY_BACKEND=sql
+    the gaps are computed by PostgreSQL instead of in Python.
     """
-    from backend.db import SessionLocal
+    sql = use_sql(db)
+
+    if days is None:
+        db.query(Availability).filter(
+            Availability.user_id == user_id,
+            Availability.source == "auto"
+        ).delete(synchronize_session=False)
 
-    with SessionLocal() as db:
-        # Fetch all busy_times for this user, sorted
-        from backend.models import BusyTime
-        rows = db.query(
+        busy = db.query(
             BusyTime.start_time,
             BusyTime.end_time
-        ).filter(BusyTime.user_id == user_id).order_by(BusyTime.start_time).all()
-
-        if not rows:
+        ).filter(BusyTime.user_id == user_id).all()
+        series = [(s, e) for _, s, e, _ in expand_series(db, [user_id], *default_window())]
+        days = {d for s, e in busy + series for d in days_spanned(s, e)}
+    else:
+        days = set(days)
+        if not days:
             return
+        runs = day_runs(days)
+        busy = []
+        for i in range(0, len(runs), RUN_CHUNK):
+            chunk = runs[i:i + RUN_CHUNK]
+            db.query(Availability).filter(
+                Availability.user_id == user_id,
+                Availability.source == "auto",
+                or_(*[and_(Availability.start_time >= a, Availability.start_time < b) for a, b in chunk])
+            ).delete(synchronize_session=False)
+
+            if not sql:
+                busy += db.query(
+                    BusyTime.start_time,
+                    BusyTime.end_time
+                ).filter(
+                    BusyTime.user_id == user_id,
+                    or_(*[overlaps(BusyTime.start_time, BusyTime.end_time, a, b) for a, b in chunk])
+                ).all()
+
+        # series occurrences only exist inside the recurrence horizon
+        series = []
+        lo, hi = default_window()
+        lo, hi = max(lo, runs[0][0]), min(hi, runs[-1][1])
+        if lo < hi:
+            series = [(s, e) for _, s, e, _ in expand_series(db, [user_id], lo, hi)]
+
+    if not days:
+        return
 
+    if sql:
+        # busy_times are read in the database; only series occurrences
+        # (which aren't stored as rows) are sent along
+        gaps = free_windows(
+            db, user_id,
+            datetime.combine(min(days), dtime.min),
+            datetime.combine(max(days), dtime.min) + timedelta(days=1),
+            extra_busy=series, days=days, busy_days_only=True
+        )
+    else:
         # Organize by calendar date
         day_events = {}
-        for s, e in rows:
-            d = s.date()
-            day_events.setdefault(d, []).append((s, e))
-
-        eight  = dtime(hour=8, minute=0)
-        twenty = dtime(hour=20, minute=0)
-
-        for day, events in day_events.items():
-            day_start = datetime.combine(day, eight)
-            day_end   = datetime.combine(day, twenty)
-
-            # Clip each busy event to [08:00, 20:00]
-            clipped = [(max(day_start, s), min(day_end, e)) for s, e in events]
-            clipped = [ev for ev in clipped if ev[0] < ev[1]]
-            clipped.sort()
-
-            cursor = day_start
-            for s, e in clipped:
-                if s > cursor:
-                    av = Availability(
-                        user_id=user_id,
-                        start_time=cursor,
-                        end_time=s,
-                        source="auto"
-                    )
-                    db.add(av)
-                cursor = max(cursor, e)
-
-            if cursor < day_end:
-                av = Availability(
-                    user_id=user_id,
-                    start_time=cursor,
-                    end_time=day_end,
-                    source="auto"
-                )
-                db.add(av)
-
-        db.commit()
+        for s, e in list(busy) + series:
+            for d in days_spanned(s, e):
+                if d in days:
+                    day_events.setdefault(d, []).append((s, e))
+        gaps = daily_gaps(day_events)
+
+    bulk_insert(
+        db, Availability, ["user_id", "start_time", "end_time", "source"],
+        ((user_id, s, e, "auto") for s, e in gaps)
+    )
+
+
+def daily_gaps(day_events):
+    """Yield the free (start, end) gaps between 08:00 and 20:00 of each day."""
+    eight  = dtime(hour=8, minute=0)
+    twenty = dtime(hour=20, minute=0)
+
+    for day, events in day_events.items():
+        day_start = datetime.combine(day, eight)
+        day_end   = datetime.combine(day, twenty)
+        yield from subtract([(day_start, day_end)], events)
@@ -1,71 +1,124 @@
-from flask import Blueprint, render_template, request, redirect, url_for
-from backend.db import SessionLocal
-from backend.models import Project, Group, Participation, WorkSession
+from flask import Blueprint, Response, render_template, request, redirect, url_for, jsonify, stream_with_context
+from sqlalchemy import select
+from backend.db import get_db, replica_reads
+from backend.models import Project, Group, Participation, WorkSession, ProjectFeasibility, User, BusyTime
+from backend.slots import horizon, sessions_in, to_bits
+from backend.calendar_sync import days_spanned
+from backend import bitmaps, feasibility
+from backend.feasibility import project_members
+from backend.ranges import overlaps
+from backend.pagination import BadPageToken, keyset_page, stream_csv
+from backend.recurrence import expand_series
+from backend.members import parse_user_ids, add_participants, remove_participants
 from datetime import datetime
+from sqlalchemy import func
 import re
 
 bp = Blueprint("projects", __name__, url_prefix="/projects")
 
+# advisory lock keys (namespace, id) that serialize booking checks
+BOOKING_PROJECT_LOCK = 6014
+BOOKING_USER_LOCK    = 6015
+
 @bp.route("/")
+@replica_reads
 def list_projects():
-    with SessionLocal() as db:
-        projects = (
-            db.query(
-                Project.project_id,
-                Project.project_name,
-                Group.group_name,
-                Project.deadline,
-                Project.estimated_hours_needed
-            )
-            .join(Group, Group.group_id == Project.group_id)
-            .order_by(Project.project_id)
-            .all()
+    db = get_db()
+    query = (
+        db.query(
+            Project.project_id,
+            Project.project_name,
+            Group.group_name,
+            Project.deadline,
+            Project.estimated_hours_needed,
+            ProjectFeasibility.free_hours,
+            ProjectFeasibility.remaining_hours,
+            ProjectFeasibility.feasible
+        )
+        .join(Group, Group.group_id == Project.group_id)
+        .outerjoin(ProjectFeasibility, ProjectFeasibility.project_id == Project.project_id)
+    )
+    try:
+        page = keyset_page(
+            query,
+            {"id": [Project.project_id], "name": [Project.project_name, Project.project_id]},
+            request.args
         )
-    return render_template("projects/list.html", projects=projects)
+    except BadPageToken as e:
+        return str(e), 400
+    return render_template("projects/list.html", projects=page.items, page=page)
+
+# ---------- EXPORT PROJECTS ----------
+@bp.route("/export.csv")
+@replica_reads
+def export_projects():
+    db = get_db()
+    stmt = (
+        select(Project.project_id, Project.project_name, Group.group_name,
+               Project.deadline, Project.estimated_hours_needed)
+          .join(Group, Group.group_id == Project.group_id)
+          .order_by(Project.project_id)
+    )
+    return Response(
+        stream_with_context(stream_csv(
+            db, stmt, ["project_id", "project_name", "group_name", "deadline", "estimated_hours_needed"]
+        )),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=projects.csv"}
+    )
 
 # ---------- NEW PROJECT ----------
 @bp.route("/new", methods=["GET", "POST"], endpoint="new_project")
 def new_project():
-    with SessionLocal() as db:
-        if request.method == "POST":
-            name     = request.form["name"]
-            group_id = int(request.form["group_id"])
-            deadline = datetime.fromisoformat(request.form["deadline"])
-            hours    = int(request.form["hours"])
-            proj = Project(
-                project_name=name,
-                group_id=group_id,
-                deadline=deadline,
-                estimated_hours_needed=hours
-            )
-            db.add(proj)
-            db.commit()
-            return redirect(url_for("projects.list_projects"))
+    db = get_db()
+    if request.method == "POST":
+        name     = request.form["name"]
+        group_id = int(request.form["group_id"])
+        deadline = datetime.fromisoformat(request.form["deadline"])
+        hours    = int(request.form["hours"])
+        proj = Project(
+            project_name=name,
+            group_id=group_id,
+            deadline=deadline,
+            estimated_hours_needed=hours
+        )
+        db.add(proj)
+        db.flush()
+        feasibility.compute(db, [proj.project_id])
+        db.commit()
+        return redirect(url_for("projects.list_projects"))
 
-        groups = db.query(Group.group_id, Group.group_name).order_by(Group.group_name).all()
+    groups = db.query(Group.group_id, Group.group_name).order_by(Group.group_name).all()
     return render_template("projects/new.html", groups=groups)
 
 # ---------- EDIT PROJECT ----------
 @bp.route("/edit/<int:project_id>", methods=["GET", "POST"])
 def edit_project(project_id):
-    with SessionLocal() as db:
-        if request.method == "POST":
-            name   = request.form["name"]
-            gid    = int(request.form["group_id"])
-            ddl    = datetime.fromisoformat(request.form["deadline"])
-            hrs    = int(request.form["hours"])
-            proj   = db.query(Project).filter(Project.project_id == project_id).first()
-            if proj:
-                proj.project_name = name
-                proj.group_id     = gid
-                proj.deadline     = ddl
-                proj.estimated_hours_needed = hrs
-                db.commit()
-            return redirect(url_for("projects.list_projects"))
-
-        proj   = db.query(Project.project_name, Project.group_id, Project.deadline, Project.estimated_hours_needed)\
-                   .filter(Project.project_id == project_id).first()
-        groups = db.query(Group.group_id, Group.group_name).order_by(Group.group_name).all()
+    db = get_db()
+    if request.method == "POST":
+        name   = request.form["name"]
+        gid    = int(request.form["group_id"])
+        ddl    = datetime.fromisoformat(request.form["deadline"])
+        hrs    = int(request.form["hours"])
+        proj   = db.query(Project).filter(Project.project_id == project_id).first()
+        if proj:
+            # moving a project without participants moves its sessions
+            # to the other group's members
+            before = bitmaps.attendees_of(db, [project_id]) if proj.group_id != gid else None
+            proj.project_name = name
+            proj.group_id     = gid
+            proj.deadline     = ddl
+            proj.estimated_hours_needed = hrs
+            db.flush()
+            if before is not None:
+                bitmaps.refresh_projects(db, [project_id], also=before)
+            feasibility.compute(db, [project_id])
+            db.commit()
+        return redirect(url_for("projects.list_projects"))
+
+    proj   = db.query(Project.project_name, Project.group_id, Project.deadline, Project.estimated_hours_needed)\
+               .filter(Project.project_id == project_id).first()
+    groups = db.query(Group.group_id, Group.group_name).order_by(Group.group_name).all()
 
     if not proj:
         return "Not found", 404
@@ -75,45 +128,56 @@ def edit_project(project_id):
 # ---------- DELETE PROJECT ----------
 @bp.route("/delete/<int:project_id>")
 def delete_project(project_id):
-    with SessionLocal() as db:
-        proj = db.query(Project).filter(Project.project_id == project_id).first()
-        if proj:
-            db.delete(proj)
-            db.commit()
+    db = get_db()
+    proj = db.query(Project).filter(Project.project_id == project_id).first()
+    if proj:
+        members = bitmaps.attendees_of(db, [project_id])
+        days = bitmaps.session_days(db, [project_id])
+        db.delete(proj)
+        db.flush()
+        bitmaps.refresh(db, members, days)
+        db.commit()
     return redirect(url_for("projects.list_projects"))
 
 # ---------- SUGGEST COMMON MEETING SLOTS ----------
 @bp.route("/suggest/<int:project_id>")
 def suggest_slots(project_id):
-    with SessionLocal() as db:
-        # Get project details
-        proj = db.query(Project.project_name, Project.group_id, Project.deadline, Project.estimated_hours_needed)\
-                 .filter(Project.project_id == project_id).first()
-        if not proj:
-            return "Project not found", 404
-
-        pname, group_id, ddl, hrs_needed = proj
-
-        # Get time slots where members are available
-        # This would be more complex in a real implementation - this is simplified
-        # For a real solution, get all available time slots of all group members,
-        # then find overlapping time slots
-
-        # Let's just mock up a few slots for now
-        from datetime import timedelta
-        suggestions = [
-            (datetime.now() + timedelta(days=1, hours=2), 
-             datetime.now() + timedelta(days=1, hours=4)),
-            (datetime.now() + timedelta(days=2, hours=10), 
-             datetime.now() + timedelta(days=2, hours=12)),
-            (datetime.now() + timedelta(days=3), 
-             datetime.now() + timedelta(days=3, hours=3))
-        ]
+    now = datetime.now()
+    db = get_db()
+    # Get project details
+    proj = db.query(Project.project_name, Project.group_id, Project.deadline, Project.estimated_hours_needed)\
+             .filter(Project.project_id == project_id).first()
+    if not proj:
+        return "Project not found", 404
+
+    pname, group_id, ddl, hrs_needed = proj
+
+    # Participants, or the whole group if nobody signed up explicitly
+    members = project_members(db, [(project_id, group_id)])[project_id]
+
+    # Hours already booked for this project count towards the estimate
+    booked = (
+        db.query(WorkSession.start_time, WorkSession.end_time)
+          .filter(WorkSession.project_id == project_id)
+          .all()
+    )
+    hrs_remaining = max((hrs_needed or 0) - sum((e - s).total_seconds() for s, e in booked) / 3600, 0)
+
+    # Common free slots from the day bitmaps; busy time and sessions of
+    # the members' other projects are already masked out there
+    origin, first, n_slots = horizon(now, ddl)
+    free = bitmaps.common_free(db, members, origin.date(), ddl.date()) if n_slots > first else 0
+
+    free &= ~to_bits(booked, origin, n_slots, partial=True)
+    suggestions = sessions_in(free, origin, first, n_slots, hrs_remaining)
+    hrs_planned = sum((e - s).total_seconds() for s, e in suggestions) / 3600
 
     return render_template("projects/suggest_slots.html", 
                           pname=pname, 
                           ddl=ddl, 
                           hrs_needed=hrs_needed, 
+                          hrs_remaining=hrs_remaining,
+                          hrs_planned=hrs_planned,
                           suggestions=suggestions,
                           project_id=project_id)
 
@@ -122,8 +186,95 @@ def suggest_slots(project_id):
 def book_session(project_id):
     start = datetime.fromisoformat(request.form["start"])
     end   = datetime.fromisoformat(request.form["end"])
-    with SessionLocal() as db:
-        ws = WorkSession(project_id=project_id, start_time=start, end_time=end)
-        db.add(ws)
-        db.commit()
+    if end <= start:
+        return "Session must end after it starts", 400
+    db = get_db()
+    proj = db.query(Project.project_id, Project.group_id).filter(Project.project_id == project_id).first()
+    if not proj:
+        return "Project not found", 404
+
+    members = project_members(db, [proj])[project_id]
+    _lock_booking(db, project_id, members)
+
+    # The day bitmaps narrow busy time down to candidate members; their
+    # 15-minute slots are coarse, so hits are confirmed against the busy
+    # rows and series occurrences themselves. Sessions are checked
+    # directly, both this project's own and those of any other project
+    # the members attend (participants, or the whole group without any)
+    candidates = bitmaps.busy_users(db, members, start, end)
+    busy = set()
+    if candidates:
+        busy |= {
+            uid for uid, in
+            db.query(BusyTime.user_id)
+              .filter(BusyTime.user_id.in_(candidates),
+                      overlaps(BusyTime.start_time, BusyTime.end_time, start, end))
+        }
+        busy |= {uid for uid, s, e, _ in expand_series(db, candidates - busy, start, end)
+                 if s < end and e > start}
+    attendees = bitmaps.session_attendees()
+    busy |= {
+        uid for uid, in
+        db.query(attendees.c.user_id)
+          .join(WorkSession, WorkSession.project_id == attendees.c.project_id)
+          .filter(attendees.c.user_id.in_(members),
+                  overlaps(WorkSession.start_time, WorkSession.end_time, start, end))
+    }
+    overlap = (
+        db.query(WorkSession.session_id)
+          .filter(WorkSession.project_id == project_id,
+                  overlaps(WorkSession.start_time, WorkSession.end_time, start, end))
+          .first()
+    )
+    if busy or overlap:
+        names = [u for (u,) in db.query(User.username).filter(User.user_id.in_(busy)).order_by(User.username)]
+        reason = f"busy: {', '.join(names)}" if names else "overlaps a session of this project"
+        return f"Cannot book {start:%Y-%m-%d %H:%M}–{end:%H:%M} ({reason})", 409
+
+    ws = WorkSession(project_id=project_id, start_time=start, end_time=end)
+    db.add(ws)
+    db.flush()
+    bitmaps.refresh(db, members, days_spanned(start, end))
+    feasibility.compute(db, [project_id])
+    db.commit()
     return redirect(url_for("projects.list_projects"))
+
+def _lock_booking(db, project_id, user_ids):
+    """
+    Hold the project and its members until commit, so two bookings that
+    share any of them check and insert one after the other. Users are
+    locked in id order, which keeps concurrent bookings from deadlocking.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return
+    db.execute(select(func.pg_advisory_xact_lock(BOOKING_PROJECT_LOCK, project_id)))
+    for uid in sorted(user_ids):
+        db.execute(select(func.pg_advisory_xact_lock(BOOKING_USER_LOCK, uid)))
+
+# ---------- PARTICIPANTS (JSON API) ----------
+@bp.route("/api/<int:project_id>/participants", methods=["GET", "POST", "DELETE"])
+def project_participants_api(project_id):
+    """List, bulk-add or bulk-remove participants: body {"user_ids": [...]} for POST/DELETE."""
+    db = get_db()
+    proj = db.query(Project.project_id, Project.group_id).filter(Project.project_id == project_id).first()
+    if not proj:
+        return jsonify({"error": "Project not found"}), 404
+
+    if request.method == "GET":
+        ids = [uid for uid, in db.query(Participation.user_id)
+                                 .filter(Participation.project_id == project_id)
+                                 .order_by(Participation.user_id)]
+        return jsonify({"project_id": project_id, "user_ids": ids})
+
+    try:
+        ids = parse_user_ids(request.get_json(silent=True))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    if request.method == "POST":
+        changed, key = add_participants(db, project_id, proj.group_id, ids), "added"
+    else:
+        changed, key = remove_participants(db, project_id, ids), "removed"
+    db.commit()
+    # ignored: already (not) participating, or not a member of the project's group
+    return jsonify({"project_id": project_id, key: changed, "ignored": sorted(set(ids) - set(changed))})
@@ -1,47 +1,42 @@
 from flask import Blueprint, render_template_string
-from backend.db import SessionLocal
+from backend.db import get_db, replica_reads
 from backend.models import Project, Participation, Availability
+from backend.freebusy import use_sql, common_free
+from backend.intervals import intersect_all
+from backend import cache
 
 bp = Blueprint("schedule", __name__, url_prefix="/schedule")
 
 # ---------- PROJECT SCHEDULE ----------
 @bp.route("/project/<int:project_id>")
+@replica_reads
 def project_schedule(project_id):
-    with SessionLocal() as db:
-        proj = db.query(Project).filter(Project.project_id == project_id).first()
-        if not proj:
-            return "Project not found", 404
-
-        members = [r[0] for r in
-            db.query(Participation.user_id).filter(Participation.project_id == project_id).all()
-        ]
-
-        avail_rows = (
+    db = get_db()
+    proj = db.query(Project).filter(Project.project_id == project_id).first()
+    if not proj:
+        return "Project not found", 404
+
+    members = [r[0] for r in
+        db.query(Participation.user_id).filter(Participation.project_id == project_id).all()
+    ]
+
+    def intersection():
+        if use_sql(db):
+            # intersection computed in PostgreSQL; only the result comes back
+            return [tuple(r) for r in common_free(db, members)]
+
+        per = {}
+        for uid, s, e in (
             db.query(Availability.user_id, Availability.start_time, Availability.end_time)
               .filter(Availability.user_id.in_(members))
-              .order_by(Availability.start_time)
               .all()
-        )
-
-    per = {}
-    for uid, s, e in avail_rows:
-        per.setdefault(uid, []).append((s, e))
-
-    def overlap(a, b):
-        s = max(a[0], b[0])
-        e = min(a[1], b[1])
-        return (s, e) if s < e else None
-
-    common = per.get(members[0], [])[:]
-    for uid in members[1:]:
-        slots = per.get(uid, [])
-        new = [
-            ov for a in common for b in slots
-            if (ov := overlap(a, b))
-        ]
-        common = new
-        if not common:
-            break
+        ):
+            per.setdefault(uid, []).append((s, e))
+
+        # k-way sweep: merged, non-duplicated windows where everyone is free
+        return intersect_all(per.get(uid, []) for uid in members)
+
+    common = cache.cached(db, ("project-common", project_id), members, intersection)
 
     return render_template_string("""
         <h2>Project Schedule: {{ proj.project_name }}</h2>
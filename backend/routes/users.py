@@ -1,6 +1,8 @@
-from flask import Blueprint, request, render_template, redirect, url_for, current_app
-from backend.db import SessionLocal
+from flask import Blueprint, Response, request, render_template, redirect, url_for, current_app, stream_with_context
+from sqlalchemy import select
+from backend.db import get_db, replica_reads
 from backend.models import User
+from backend.pagination import BadPageToken, keyset_page, stream_csv
 import logging
 from sqlalchemy.exc import SQLAlchemyError
 import re
@@ -10,16 +12,34 @@ emailpattern = re.compile(r'[a-zA-Z0-9]+@[a-zA-Z0-9]+\.[a-zA-Z]{2,63}') # Email
 
 # ---------- LIST USERS ----------
 @bp.route("/")
+@replica_reads
 def list_users():
-    users = []
     try:
-        with SessionLocal() as db:
-            users = db.query(User.user_id, User.username, User.email).order_by(User.user_id).all()
+        db = get_db()
+        page = keyset_page(
+            db.query(User.user_id, User.username, User.email),
+            {"id": [User.user_id], "name": [User.username, User.user_id]},
+            request.args
+        )
+    except BadPageToken as e:
+        return str(e), 400
     except SQLAlchemyError as e:
         logging.error(f"Database error in list_users: {str(e)}")
         return f"Database connection error. Please check your configuration.", 500
-        
-    return render_template("users/list.html", users=users)
+
+    return render_template("users/list.html", users=page.items, page=page)
+
+# ---------- EXPORT USERS ----------
+@bp.route("/export.csv")
+@replica_reads
+def export_users():
+    db = get_db()
+    stmt = select(User.user_id, User.username, User.email).order_by(User.user_id)
+    return Response(
+        stream_with_context(stream_csv(db, stmt, ["user_id", "username", "email"])),
+        mimetype="text/csv",
+        headers={"Content-Disposition": "attachment; filename=users.csv"}
+    )
 
 # ---------- REGISTER USER ----------
 @bp.route("/new", methods=["GET", "POST"], endpoint="register")
@@ -30,10 +50,10 @@ def register():
             email    = request.form["email"]
             pwd      = request.form["password"]
             if check_email_valid(email) == True:
-                with SessionLocal() as db:
-                    new = User(username=username, email=email, password=pwd)
-                    db.add(new)
-                    db.commit()
+                db = get_db()
+                new = User(username=username, email=email, password=pwd)
+                db.add(new)
+                db.commit()
                 return redirect(url_for("users.list_users"))
             else:
                 return f"Invalid email was entered! Please try again", 500
@@ -49,22 +69,22 @@ def register():
 def edit_user(user_id):
     user = None
     try:
-        with SessionLocal() as db:
-            if request.method == "POST":
-                uname = request.form["username"]
-                mail  = request.form["email"]
-                user  = db.query(User).filter(User.user_id == user_id).first()
-                if check_email_valid(mail) == True:
-                    if user:
-                        user.username = uname
-                        user.email    = mail
-                        db.commit()
-                    return redirect(url_for("users.list_users"))
-                else:
-                    return f"Invalid email was entered! Please try again", 500
+        db = get_db()
+        if request.method == "POST":
+            uname = request.form["username"]
+            mail  = request.form["email"]
+            user  = db.query(User).filter(User.user_id == user_id).first()
+            if check_email_valid(mail) == True:
+                if user:
+                    user.username = uname
+                    user.email    = mail
+                    db.commit()
+                return redirect(url_for("users.list_users"))
+            else:
+                return f"Invalid email was entered! Please try again", 500
 
 
-            user = db.query(User.username, User.email).filter(User.user_id == user_id).first()
+        user = db.query(User.username, User.email).filter(User.user_id == user_id).first()
     except SQLAlchemyError as e:
         logging.error(f"Database error in edit_user: {str(e)}")
         return f"Database error while editing user. Please try again later.", 500
@@ -78,11 +98,11 @@ def edit_user(user_id):
 @bp.route("/delete/<int:user_id>")
 def delete_user(user_id):
     try:
-        with SessionLocal() as db:
-            user = db.query(User).filter(User.user_id == user_id).first()
-            if user:
-                db.delete(user)
-                db.commit()
+        db = get_db()
+        user = db.query(User).filter(User.user_id == user_id).first()
+        if user:
+            db.delete(user)
+            db.commit()
     except SQLAlchemyError as e:
         logging.error(f"Database error in delete_user: {str(e)}")
         return f"Database error while deleting user. Please try again later.", 500
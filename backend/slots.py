@@ -0,0 +1,124 @@
+# backend/slots.py
+"""
+Slot-bitmap scheduling helpers.
+
+Time is cut into SLOT_MINUTES slots counted from an origin, and a set of
+slots is a Python int used as a bit array (bit i = slot i). Intersecting
+the free time of a whole group is then a handful of word-wise ANDs over a
+few hundred machine words, even for a semester-long horizon.
+"""
+from datetime import timedelta
+
+SLOT_MINUTES = 15
+SLOT = timedelta(minutes=SLOT_MINUTES)
+
+# sessions the solver proposes: at least MIN, at most MAX long
+MIN_SESSION_SLOTS = 4
+MAX_SESSION_SLOTS = 12
+
+
+def ceil_slot(dt):
+    """Round a datetime up to the next slot boundary."""
+    floor = dt.replace(minute=dt.minute - dt.minute % SLOT_MINUTES, second=0, microsecond=0)
+    return floor if floor == dt else floor + SLOT
+
+
+def slot_index(origin, dt, up=False):
+    n, rem = divmod(dt - origin, SLOT)
+    return n + (1 if up and rem else 0)
+
+
+def slot_time(origin, i):
+    return origin + i * SLOT
+
+
+def to_bits(intervals, origin, n_slots, partial=False):
+    """
+    Bitmap of the slots entirely covered by (start, end) intervals, or of
+    every slot they touch at all with partial=True.
+    """
+    bits = 0
+    for s, e in intervals:
+        a = max(slot_index(origin, s, up=not partial), 0)
+        b = min(slot_index(origin, e, up=partial), n_slots)
+        if a < b:
+            bits |= ((1 << (b - a)) - 1) << a
+    return bits
+
+
+def runs(bits):
+    """Yield (first, last + 1) slot index pairs of each run of set bits."""
+    while bits:
+        low = bits & -bits
+        start = low.bit_length() - 1
+        carried = bits + low          # clears the lowest run, sets the bit above it
+        end = (carried & -carried).bit_length() - 1
+        yield start, end
+        bits &= carried
+
+
+def sessions_from_runs(free_runs, min_len=MIN_SESSION_SLOTS, max_len=MAX_SESSION_SLOTS):
+    """Split free runs into near-equal candidate sessions of min_len..max_len slots."""
+    for a, b in free_runs:
+        length = b - a
+        if length < min_len:
+            continue
+        parts = -(-length // max_len)
+        size, extra = divmod(length, parts)
+        for i in range(parts):
+            n = size + (1 if i < extra else 0)
+            yield a, a + n
+            a += n
+
+
+def plan_sessions(free, needed_slots, slots_per_day):
+    """
+    Pick sessions out of the `free` bitmap until `needed_slots` are covered.
+
+    Candidates are ranked longest first, spreading the work over as many
+    days as possible and, within that, as early as possible so some slack
+    is left before the deadline. Returns (start_index, end_index) pairs in
+    rank order; the last session is trimmed to what is still needed.
+    """
+    candidates = sorted(sessions_from_runs(runs(free)), key=lambda c: (c[0] - c[1], c[0]))
+    chosen, days, covered = [], set(), 0
+    deferred = []
+    for a, b in candidates:
+        if covered >= needed_slots:
+            break
+        if a // slots_per_day in days:
+            deferred.append((a, b))
+            continue
+        days.add(a // slots_per_day)
+        chosen.append((a, b))
+        covered += b - a
+    for a, b in deferred:
+        if covered >= needed_slots:
+            break
+        chosen.append((a, b))
+        covered += b - a
+
+    if chosen and covered > needed_slots:
+        a, b = chosen[-1]
+        chosen[-1] = (a, b - min(covered - needed_slots, b - a - 1))
+    return chosen
+
+
+def horizon(now, deadline):
+    """(origin, first, n_slots): midnight of today, the next slot and the deadline's slot."""
+    first = ceil_slot(now)
+    origin = first.replace(hour=0, minute=0)
+    return origin, slot_index(origin, first), slot_index(origin, deadline)
+
+
+def sessions_in(free, origin, first, n_slots, hours_needed):
+    """Ranked (start, end) sessions out of a `free` bitmap counted from `origin`."""
+    if n_slots <= first or hours_needed <= 0:
+        return []
+    free &= ((1 << n_slots) - 1) ^ ((1 << first) - 1)
+    needed_slots = -(-int(hours_needed * 60) // SLOT_MINUTES)
+    slots_per_day = timedelta(days=1) // SLOT
+    return [
+        (slot_time(origin, a), slot_time(origin, b))
+        for a, b in plan_sessions(free, needed_slots, slots_per_day)
+    ]
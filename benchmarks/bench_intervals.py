@@ -0,0 +1,91 @@
+# benchmarks/bench_intervals.py
+"""
+Compare the k-way sweep intersection in backend.intervals with the old
+pairwise overlap loop from project_schedule on synthetic availability.
+
+    python benchmarks/bench_intervals.py [--members 10,100,300,500] [--years 1,3]
+
+Each member gets a few free blocks per working day; the pairwise loop is
+only timed up to PAIRWISE_MAX intervals since it grows quadratically.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from backend.intervals import intersect_all, subtract  # noqa: E402
+
+PAIRWISE_MAX = 200_000
+
+
+def member_availability(rng, start, days):
+    out = []
+    for d in range(days):
+        day = start + timedelta(days=d)
+        if day.weekday() >= 5:
+            continue
+        cursor = day.replace(hour=8)
+        for _ in range(rng.randint(1, 4)):
+            s = cursor + timedelta(minutes=15 * rng.randint(0, 8))
+            e = s + timedelta(minutes=15 * rng.randint(2, 12))
+            if e.hour >= 20:
+                break
+            out.append((s, e))
+            cursor = e
+    return out
+
+
+def pairwise(lists):
+    def overlap(a, b):
+        s = max(a[0], b[0])
+        e = min(a[1], b[1])
+        return (s, e) if s < e else None
+
+    common = lists[0][:]
+    for slots in lists[1:]:
+        common = [ov for a in common for b in slots if (ov := overlap(a, b))]
+        if not common:
+            break
+    return common
+
+
+def timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--members", default="10,100,300,500")
+    ap.add_argument("--years", default="1,3")
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    start = datetime(2024, 1, 1)
+    print(f"{'members':>8} {'years':>5} {'intervals':>10} {'sweep s':>9} "
+          f"{'pairwise s':>11} {'subtract s':>11} {'common':>7}")
+    for years in (int(y) for y in args.years.split(",")):
+        for members in (int(m) for m in args.members.split(",")):
+            lists = [member_availability(rng, start, 365 * years) for _ in range(members)]
+            total = sum(map(len, lists))
+
+            common, t_sweep = timed(intersect_all, lists)
+            if total <= PAIRWISE_MAX:
+                _, t_pair = timed(pairwise, lists)
+                pair = f"{t_pair:11.3f}"
+            else:
+                pair = f"{'-':>11}"
+            # busy-time subtraction: one member's free time minus everyone else's
+            _, t_sub = timed(subtract, lists[0], [iv for lst in lists[1:] for iv in lst])
+
+            print(f"{members:>8} {years:>5} {total:>10} {t_sweep:9.3f} {pair} {t_sub:11.3f} {len(common):>7}")
+
+
+if __name__ == "__main__":
+    main()
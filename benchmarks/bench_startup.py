@@ -0,0 +1,77 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start cost of a worker process: importing backend.app, building the
+app with create_app(), and serving the first request (which opens the
+first database connection).
+
+    python benchmarks/bench_startup.py [--runs 5] [--path /users/] [--importtime 15]
+
+Every run is a fresh interpreter, so nothing is cached between them.
+--importtime also lists the slowest modules (self time) of one import.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+import backend.app
+t1 = time.perf_counter()
+app = backend.app.create_app()
+t2 = time.perf_counter()
+status = app.test_client().get(sys.argv[1]).status_code
+t3 = time.perf_counter()
+print(json.dumps({"import": t1 - t0, "create_app": t2 - t1, "first_request": t3 - t2, "status": status}))
+"""
+
+
+def run_once(path):
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, path],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(limit):
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import backend.app"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        rows.append((int(self_us), name.strip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--path", default="/users/")
+    ap.add_argument("--importtime", type=int, default=0, metavar="N")
+    args = ap.parse_args()
+
+    results = [run_once(args.path) for _ in range(args.runs)]
+    print(f"{args.runs} cold starts, first request GET {args.path} -> {results[-1]['status']}")
+    for key in ("import", "create_app", "first_request"):
+        times = [r[key] * 1000 for r in results]
+        print(f"  {key:<14} median {statistics.median(times):8.1f} ms   "
+              f"min {min(times):8.1f} ms   max {max(times):8.1f} ms")
+
+    if args.importtime:
+        print(f"\nslowest imports (self time):")
+        for us, name in slowest_imports(args.importtime):
+            print(f"  {us / 1000:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
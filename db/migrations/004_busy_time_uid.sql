@@ -0,0 +1,12 @@
+-- db/migrations/004_busy_time_uid.sql
+-- Key imported events on their VEVENT UID so re-uploads can be diffed
+
+ALTER TABLE busy_times
+  ADD COLUMN IF NOT EXISTS uid TEXT,
+  ADD COLUMN IF NOT EXISTS recurrence_id TIMESTAMP,
+  ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- RECURRENCE-ID distinguishes overridden instances that share a series UID
+CREATE UNIQUE INDEX IF NOT EXISTS busy_times_import_key
+  ON busy_times (user_id, calendar_id, uid, COALESCE(recurrence_id, '-infinity'::timestamp))
+  WHERE uid IS NOT NULL;
@@ -0,0 +1,18 @@
+-- db/migrations/005_busy_series.sql
+-- Recurring events are stored once as a master rule and expanded on read
+
+CREATE TABLE IF NOT EXISTS busy_series (
+    series_id    SERIAL PRIMARY KEY,
+    user_id      INTEGER REFERENCES users(user_id),
+    calendar_id  TEXT DEFAULT 'default',
+    uid          TEXT NOT NULL,
+    start_time   TIMESTAMP NOT NULL,   -- first occurrence (server-local)
+    end_time     TIMESTAMP NOT NULL,
+    tzid         TEXT,                 -- zone the rule is evaluated in
+    rrule        TEXT NOT NULL,
+    exdates      TEXT,                 -- newline-separated ISO timestamps
+    until_time   TIMESTAMP,            -- end of last occurrence, NULL = open-ended
+    description  TEXT,
+    content_hash TEXT,
+    UNIQUE (user_id, calendar_id, uid)
+);
@@ -0,0 +1,18 @@
+-- db/migrations/006_import_jobs.sql
+-- Calendar uploads are processed as background jobs
+
+CREATE TABLE IF NOT EXISTS import_jobs (
+    job_id          SERIAL PRIMARY KEY,
+    user_id         INTEGER REFERENCES users(user_id) ON DELETE CASCADE,
+    filename        TEXT,
+    payload_path    TEXT,
+    status          TEXT NOT NULL DEFAULT 'queued',  -- queued | running | done | failed
+    calendars_total INTEGER DEFAULT 0,
+    calendars_done  INTEGER DEFAULT 0,
+    rows_inserted   INTEGER DEFAULT 0,
+    rows_updated    INTEGER DEFAULT 0,
+    rows_deleted    INTEGER DEFAULT 0,
+    error           TEXT,
+    created_at      TIMESTAMP DEFAULT now(),
+    finished_at     TIMESTAMP
+);
@@ -0,0 +1,93 @@
+-- db/migrations/007_freebusy_functions.sql
+-- Free/busy computed inside PostgreSQL with range and multirange types.
+-- Requires PostgreSQL 14+ (tsmultirange, range_agg, range_intersect_agg);
+-- on older servers the functions are skipped and the app keeps computing
+-- free/busy in Python. Used by the app when FREEBUSY_BACKEND=sql.
+
+DO $migration$
+BEGIN
+IF current_setting('server_version_num')::int < 140000 THEN
+    RAISE NOTICE 'PostgreSQL 14+ needed for the free/busy functions; skipped';
+    RETURN;
+END IF;
+
+-- A user's busy time inside [p_from, p_to) as one multirange
+EXECUTE $fn$
+CREATE OR REPLACE FUNCTION user_busy(p_user_id INTEGER, p_from TIMESTAMP, p_to TIMESTAMP)
+RETURNS tsmultirange
+LANGUAGE sql STABLE AS $$
+    SELECT COALESCE(range_agg(tsrange(start_time, end_time) * tsrange(p_from, p_to)),
+                    '{}'::tsmultirange)
+    FROM busy_times
+    WHERE user_id = p_user_id
+      AND start_time < p_to
+      AND end_time > p_from
+      AND start_time < end_time
+$$
+$fn$;
+
+-- Free working-hour windows of a user. Busy times that only exist outside
+-- the table (expanded recurring events) can be passed in p_extra_busy.
+-- p_days limits the result to some dates; p_busy_days_only keeps only
+-- days with at least one busy event (how 'auto' availability is derived).
+EXECUTE $fn$
+CREATE OR REPLACE FUNCTION user_free_windows(
+    p_user_id        INTEGER,
+    p_from           TIMESTAMP,
+    p_to             TIMESTAMP,
+    p_day_start      TIME         DEFAULT '08:00',
+    p_day_end        TIME         DEFAULT '20:00',
+    p_extra_busy     tsmultirange DEFAULT '{}',
+    p_days           DATE[]       DEFAULT NULL,
+    p_busy_days_only BOOLEAN      DEFAULT FALSE
+)
+RETURNS TABLE (start_time TIMESTAMP, end_time TIMESTAMP)
+LANGUAGE sql STABLE AS $$
+    WITH busy AS (
+        SELECT user_busy(p_user_id, p_from, p_to) + p_extra_busy AS m
+    ),
+    hours AS (
+        SELECT COALESCE(
+                   range_agg(tsrange(d::date + p_day_start, d::date + p_day_end) * tsrange(p_from, p_to)),
+                   '{}'::tsmultirange) AS m
+        FROM busy,
+             generate_series(date_trunc('day', p_from), p_to - interval '1 microsecond', interval '1 day') AS d
+        WHERE (p_days IS NULL OR d::date = ANY (p_days))
+          AND (NOT p_busy_days_only OR busy.m && tsrange(d, d + interval '1 day'))
+    )
+    SELECT lower(r), upper(r)
+    FROM hours, busy, unnest(hours.m - busy.m) AS r
+    ORDER BY 1
+$$
+$fn$;
+
+-- Windows where every user in p_user_ids has an availability row
+EXECUTE $fn$
+CREATE OR REPLACE FUNCTION group_common_free(
+    p_user_ids INTEGER[],
+    p_from     TIMESTAMP DEFAULT '-infinity',
+    p_to       TIMESTAMP DEFAULT 'infinity'
+)
+RETURNS TABLE (start_time TIMESTAMP, end_time TIMESTAMP)
+LANGUAGE sql STABLE AS $$
+    WITH per_user AS (
+        SELECT u,
+               COALESCE(range_agg(tsrange(a.start_time, a.end_time) * tsrange(p_from, p_to))
+                            FILTER (WHERE a.user_id IS NOT NULL),
+                        '{}'::tsmultirange) AS free
+        FROM unnest(p_user_ids) AS u
+        LEFT JOIN availabilities a
+               ON a.user_id = u
+              AND a.start_time < p_to
+              AND a.end_time > p_from
+              AND a.start_time < a.end_time
+        GROUP BY u
+    )
+    SELECT lower(r), upper(r)
+    FROM unnest((SELECT range_intersect_agg(free) FROM per_user)) AS r
+    ORDER BY 1
+$$
+$fn$;
+
+END
+$migration$;
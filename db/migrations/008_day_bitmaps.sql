@@ -0,0 +1,12 @@
+-- db/migrations/008_day_bitmaps.sql
+-- Per-user, per-day free/busy bitmaps (96 x 15-minute slots, bit i = slot i)
+
+CREATE TABLE IF NOT EXISTS day_bitmaps (
+    user_id  INTEGER NOT NULL REFERENCES users(user_id) ON DELETE CASCADE,
+    day      DATE    NOT NULL,
+    free     BYTEA   NOT NULL,   -- slots entirely covered by availability
+    busy     BYTEA   NOT NULL,   -- slots touched by busy time or booked sessions
+    PRIMARY KEY (user_id, day)
+);
+
+CREATE INDEX IF NOT EXISTS day_bitmaps_day_idx ON day_bitmaps (day);
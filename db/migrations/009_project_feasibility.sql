@@ -0,0 +1,11 @@
+-- db/migrations/009_project_feasibility.sql
+-- Deadline feasibility of open projects, refreshed by a scheduled batch job
+
+CREATE TABLE IF NOT EXISTS project_feasibility (
+    project_id      INTEGER PRIMARY KEY REFERENCES projects(project_id) ON DELETE CASCADE,
+    free_hours      REAL NOT NULL,   -- common free hours left before the deadline
+    booked_hours    REAL NOT NULL,   -- hours already booked as work sessions
+    remaining_hours REAL NOT NULL,   -- estimate minus booked hours
+    feasible        BOOLEAN NOT NULL,
+    computed_at     TIMESTAMP NOT NULL DEFAULT now()
+);
@@ -0,0 +1,8 @@
+-- db/migrations/010_user_versions.sql
+-- Change counter per user, bumped whenever their free/busy data changes;
+-- cached availability results are keyed on it
+
+CREATE TABLE IF NOT EXISTS user_versions (
+    user_id INTEGER PRIMARY KEY REFERENCES users(user_id) ON DELETE CASCADE,
+    version BIGINT  NOT NULL DEFAULT 0
+);
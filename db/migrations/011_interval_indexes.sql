@@ -0,0 +1,94 @@
+-- db/migrations/011_interval_indexes.sql
+-- Indexes for per-user lookups and time-window overlap queries.
+-- Window queries use `tsrange(start_time, end_time, '[]') && tsrange(lo, hi, '()')`,
+-- which the (user_id, tsrange) GiST indexes answer via btree_gist. Rows are
+-- closed ranges so zero-length ones (events without an end) aren't empty;
+-- windows are open, so rows merely touching a window's edge don't match.
+-- Same result as `start_time < hi AND end_time > lo` (backend/ranges.py).
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- tsrange() rejects inverted bounds; such rows never described real time
+DELETE FROM busy_times     WHERE end_time < start_time;
+DELETE FROM availabilities WHERE end_time < start_time;
+DELETE FROM work_sessions  WHERE end_time < start_time;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'busy_times_valid_range') THEN
+        ALTER TABLE busy_times ADD CONSTRAINT busy_times_valid_range CHECK (end_time >= start_time);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'availabilities_valid_range') THEN
+        ALTER TABLE availabilities ADD CONSTRAINT availabilities_valid_range CHECK (end_time >= start_time);
+    END IF;
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'work_sessions_valid_range') THEN
+        ALTER TABLE work_sessions ADD CONSTRAINT work_sessions_valid_range CHECK (end_time >= start_time);
+    END IF;
+END
+$$;
+
+-- btree: equality on the owner, ordered by start
+CREATE INDEX IF NOT EXISTS busy_times_user_start_idx     ON busy_times (user_id, start_time);
+CREATE INDEX IF NOT EXISTS availabilities_user_start_idx ON availabilities (user_id, start_time);
+CREATE INDEX IF NOT EXISTS availabilities_user_source_start_idx
+  ON availabilities (user_id, source, start_time);
+CREATE INDEX IF NOT EXISTS work_sessions_project_start_idx ON work_sessions (project_id, start_time);
+CREATE INDEX IF NOT EXISTS memberships_group_idx   ON memberships (group_id);
+CREATE INDEX IF NOT EXISTS participation_project_idx ON participation (project_id);
+CREATE INDEX IF NOT EXISTS import_jobs_user_idx    ON import_jobs (user_id);
+
+-- GiST: owner + time range overlap
+CREATE INDEX IF NOT EXISTS busy_times_user_range_idx
+  ON busy_times USING gist (user_id, tsrange(start_time, end_time, '[]'));
+CREATE INDEX IF NOT EXISTS availabilities_user_range_idx
+  ON availabilities USING gist (user_id, tsrange(start_time, end_time, '[]'));
+CREATE INDEX IF NOT EXISTS work_sessions_project_range_idx
+  ON work_sessions USING gist (project_id, tsrange(start_time, end_time, '[]'));
+
+-- free/busy functions from 007, rewritten to use the overlap operator
+-- (PostgreSQL 14+ only, like 007)
+DO $migration$
+BEGIN
+IF current_setting('server_version_num')::int < 140000 THEN
+    RETURN;
+END IF;
+
+EXECUTE $fn$
+CREATE OR REPLACE FUNCTION user_busy(p_user_id INTEGER, p_from TIMESTAMP, p_to TIMESTAMP)
+RETURNS tsmultirange
+LANGUAGE sql STABLE AS $$
+    SELECT COALESCE(range_agg(tsrange(start_time, end_time) * tsrange(p_from, p_to)),
+                    '{}'::tsmultirange)
+    FROM busy_times
+    WHERE user_id = p_user_id
+      AND tsrange(start_time, end_time, '[]') && tsrange(p_from, p_to, '()')
+$$
+$fn$;
+
+EXECUTE $fn$
+CREATE OR REPLACE FUNCTION group_common_free(
+    p_user_ids INTEGER[],
+    p_from     TIMESTAMP DEFAULT '-infinity',
+    p_to       TIMESTAMP DEFAULT 'infinity'
+)
+RETURNS TABLE (start_time TIMESTAMP, end_time TIMESTAMP)
+LANGUAGE sql STABLE AS $$
+    WITH per_user AS (
+        SELECT u,
+               COALESCE(range_agg(tsrange(a.start_time, a.end_time) * tsrange(p_from, p_to))
+                            FILTER (WHERE a.user_id IS NOT NULL),
+                        '{}'::tsmultirange) AS free
+        FROM unnest(p_user_ids) AS u
+        LEFT JOIN availabilities a
+               ON a.user_id = u
+              AND tsrange(a.start_time, a.end_time, '[]') && tsrange(p_from, p_to, '()')
+        GROUP BY u
+    )
+    SELECT lower(r), upper(r)
+    FROM unnest((SELECT range_intersect_agg(free) FROM per_user)) AS r
+    ORDER BY 1
+$$
+$fn$;
+
+END
+$migration$;
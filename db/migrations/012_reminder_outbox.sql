@@ -0,0 +1,19 @@
+-- db/migrations/012_reminder_outbox.sql
+-- Reminders are queued once per (project, recipient, kind) and drained by
+-- whichever app process gets to them first (FOR UPDATE SKIP LOCKED)
+
+CREATE TABLE IF NOT EXISTS reminder_outbox (
+    outbox_id  SERIAL PRIMARY KEY,
+    project_id INTEGER NOT NULL REFERENCES projects(project_id) ON DELETE CASCADE,
+    recipient  TEXT    NOT NULL,
+    kind       TEXT    NOT NULL,                  -- e.g. deadline_24h
+    status     TEXT    NOT NULL DEFAULT 'pending', -- pending | sent | failed
+    attempts   INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT now(),
+    sent_at    TIMESTAMP,
+    UNIQUE (project_id, recipient, kind)
+);
+
+CREATE INDEX IF NOT EXISTS reminder_outbox_pending_idx
+  ON reminder_outbox (outbox_id) WHERE status = 'pending';
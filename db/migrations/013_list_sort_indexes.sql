@@ -0,0 +1,6 @@
+-- db/migrations/013_list_sort_indexes.sql
+-- Keyset pagination of the list pages sorted by name seeks on (name, id)
+
+CREATE INDEX IF NOT EXISTS users_username_id_idx      ON users (username, user_id);
+CREATE INDEX IF NOT EXISTS groups_group_name_id_idx   ON groups (group_name, group_id);
+CREATE INDEX IF NOT EXISTS projects_project_name_id_idx ON projects (project_name, project_id);
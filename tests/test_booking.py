@@ -0,0 +1,115 @@
+# tests/test_booking.py
+"""
+Booking conflicts across projects of one group. Needs the PostgreSQL
+database configured in .env (migrations applied); skipped otherwise. The
+test creates its own users, group and projects and removes them again.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+# don't let the app pick up real import jobs from this database
+os.environ.setdefault("ICS_IMPORT_RECOVER", "false")
+
+from sqlalchemy import text  # noqa: E402
+
+from backend.app import create_app  # noqa: E402
+from backend import bitmaps  # noqa: E402
+from backend.db import SessionLocal, check_connection, get_engine  # noqa: E402
+
+pytestmark = pytest.mark.skipif(not check_connection(), reason="database not reachable")
+
+
+@pytest.fixture
+def group_with_two_projects():
+    tag = uuid.uuid4().hex[:8]
+    deadline = datetime.now() + timedelta(days=7)
+    with get_engine().begin() as conn:
+        uids = [conn.execute(text(
+            "INSERT INTO users (username, email, password) VALUES (:u, :m, 'x') RETURNING user_id"
+        ), {"u": f"{name}-{tag}", "m": f"{name}-{tag}@example.com"}).scalar() for name in ("ann", "bob")]
+        gid = conn.execute(text(
+            "INSERT INTO groups (group_name) VALUES (:g) RETURNING group_id"
+        ), {"g": f"group-{tag}"}).scalar()
+        for uid in uids:
+            conn.execute(text("INSERT INTO memberships (user_id, group_id) VALUES (:u, :g)"), {"u": uid, "g": gid})
+        # no participants: both projects take the whole group's time
+        pids = [conn.execute(text(
+            "INSERT INTO projects (project_name, group_id, deadline, estimated_hours_needed)"
+            " VALUES (:n, :g, :d, 2) RETURNING project_id"
+        ), {"n": f"{name}-{tag}", "g": gid, "d": deadline}).scalar() for name in ("a", "b")]
+
+    yield pids, uids
+
+    with get_engine().begin() as conn:
+        conn.execute(text("DELETE FROM busy_times WHERE user_id = ANY(:u)"), {"u": uids})
+        conn.execute(text("DELETE FROM work_sessions WHERE project_id = ANY(:p)"), {"p": pids})
+        conn.execute(text("DELETE FROM project_feasibility WHERE project_id = ANY(:p)"), {"p": pids})
+        conn.execute(text("DELETE FROM projects WHERE project_id = ANY(:p)"), {"p": pids})
+        conn.execute(text("DELETE FROM memberships WHERE group_id = :g"), {"g": gid})
+        conn.execute(text("DELETE FROM groups WHERE group_id = :g"), {"g": gid})
+        conn.execute(text("DELETE FROM day_bitmaps WHERE user_id = ANY(:u)"), {"u": uids})
+        conn.execute(text("DELETE FROM user_versions WHERE user_id = ANY(:u)"), {"u": uids})
+        conn.execute(text("DELETE FROM users WHERE user_id = ANY(:u)"), {"u": uids})
+
+
+def tomorrow():
+    return (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+def test_sibling_projects_cannot_share_a_slot(group_with_two_projects):
+    (project_a, project_b), _ = group_with_two_projects
+    client = create_app().test_client()
+    day = tomorrow()
+    slot = {"start": f"{day}T10:00", "end": f"{day}T11:00"}
+
+    assert client.post(f"/projects/book/{project_a}", data=slot).status_code == 302
+    assert client.post(f"/projects/book/{project_b}", data=slot).status_code == 409
+    # the neighbouring hour is still free
+    later = {"start": f"{day}T11:00", "end": f"{day}T12:00"}
+    assert client.post(f"/projects/book/{project_b}", data=later).status_code == 302
+
+
+def test_busy_time_is_checked_to_the_minute(group_with_two_projects):
+    (project_a, _), (ann, _) = group_with_two_projects
+    day = tomorrow()
+    with SessionLocal() as db:
+        db.execute(text(
+            "INSERT INTO busy_times (user_id, start_time, end_time) VALUES (:u, :s, :e)"
+        ), {"u": ann, "s": f"{day} 10:00", "e": f"{day} 10:10"})
+        bitmaps.refresh(db, [ann], {datetime.fromisoformat(day).date()})
+        db.commit()
+    client = create_app().test_client()
+    # the second booking shares the busy event's 15-minute slot, not its time
+    assert client.post(f"/projects/book/{project_a}",
+                       data={"start": f"{day}T10:05", "end": f"{day}T11:00"}).status_code == 409
+    assert client.post(f"/projects/book/{project_a}",
+                       data={"start": f"{day}T10:10", "end": f"{day}T11:00"}).status_code == 302
+
+
+def test_concurrent_bookings_of_one_slot(group_with_two_projects):
+    pids, _ = group_with_two_projects
+    app = create_app()
+    day = tomorrow()
+    slot = {"start": f"{day}T14:00", "end": f"{day}T15:00"}
+    ready = threading.Barrier(len(pids))
+    codes = []
+
+    def book(pid):
+        client = app.test_client()
+        ready.wait()
+        codes.append(client.post(f"/projects/book/{pid}", data=slot).status_code)
+
+    threads = [threading.Thread(target=book, args=(pid,)) for pid in pids]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(codes) == [302, 409]
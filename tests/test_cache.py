@@ -0,0 +1,55 @@
+# tests/test_cache.py
+"""Versioned result cache. No database needed (SQLite in memory)."""
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from backend import cache  # noqa: E402
+from backend.models import UserVersion  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    UserVersion.__table__.create(engine)
+    cache.clear()
+    with Session(engine) as session:
+        yield session
+    cache.clear()
+
+
+def test_versions_start_at_zero_and_bump(db):
+    assert cache.versions(db, [2, 1, 2]) == ((1, 0), (2, 0))
+    cache.bump(db, [1])
+    cache.bump(db, [1, 2])
+    assert cache.versions(db, [1, 2]) == ((1, 2), (2, 1))
+
+
+def test_result_is_reused_until_a_user_changes(db):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert cache.cached(db, ("group", 1), [1, 2], compute) == 1
+    assert cache.cached(db, ("group", 1), [1, 2], compute) == 1
+    # another scope or window is another entry
+    assert cache.cached(db, ("group", 1), [1, 2], compute, window=("a", "b")) == 2
+    cache.bump(db, [2])
+    assert cache.cached(db, ("group", 1), [1, 2], compute) == 3
+    # a user outside the set doesn't invalidate it
+    cache.bump(db, [3])
+    assert cache.cached(db, ("group", 1), [1, 2], compute) == 3
+
+
+def test_lru_is_bounded(db, monkeypatch):
+    monkeypatch.setattr(cache, "MAX_ENTRIES", 2)
+    for i in range(5):
+        cache.cached(db, ("scope", i), [], lambda: i)
+    assert len(cache._lru) == 2
@@ -0,0 +1,80 @@
+# tests/test_ics_stream.py
+"""
+The streaming .ics reader: line unfolding, content lines, events and the
+calendar's own properties. No database needed.
+"""
+import io
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from backend.ics_stream import (  # noqa: E402
+    IcsParseError, calendar_name, parse_duration, read_calendar, split_content_line, unfold_lines,
+)
+
+
+def calendar(*lines):
+    return io.BytesIO(("\r\n".join(("BEGIN:VCALENDAR",) + lines + ("END:VCALENDAR",)) + "\r\n").encode())
+
+
+def test_folded_lines_are_joined():
+    fp = io.BytesIO(b"SUMMARY:Weekly \r\n  planning\r\n\tmeeting\r\nUID:1\r\n")
+    assert list(unfold_lines(fp)) == ["SUMMARY:Weekly  planningmeeting", "UID:1"]
+
+
+def test_content_line_with_quoted_colon():
+    name, params, value = split_content_line('DTSTART;TZID="Europe/Copenhagen:x";VALUE=DATE-TIME:20260301T100000')
+    assert name == "DTSTART"
+    assert params == {"TZID": "Europe/Copenhagen:x", "VALUE": "DATE-TIME"}
+    assert value == "20260301T100000"
+
+
+def test_malformed_content_line():
+    with pytest.raises(IcsParseError):
+        split_content_line("NO COLON HERE")
+
+
+def test_not_a_calendar():
+    with pytest.raises(IcsParseError):
+        read_calendar(io.BytesIO(b"BEGIN:VCARD\r\nEND:VCARD\r\n"))
+
+
+def test_events_and_calendar_properties():
+    props, events = read_calendar(calendar(
+        "X-WR-CALNAME:Work\\, shared",
+        "BEGIN:VTIMEZONE", "TZID:Europe/Copenhagen", "END:VTIMEZONE",
+        "BEGIN:VEVENT", "UID:a", "DTSTART:20260301T100000", "DURATION:PT1H30M",
+        "SUMMARY:Lab\\nsession", "BEGIN:VALARM", "TRIGGER:-PT5M", "END:VALARM", "END:VEVENT",
+        "BEGIN:VEVENT", "UID:b", "DTSTART;VALUE=DATE:20260302", "END:VEVENT",
+        "BEGIN:VEVENT", "UID:c", "DTSTART:20260303T090000", "END:VEVENT",
+    ))
+    assert calendar_name(props) == "Work, shared"
+    a, b, c = list(events)
+    assert (a.uid, a.start, a.end, a.summary) == (
+        "a", datetime(2026, 3, 1, 10), datetime(2026, 3, 1, 11, 30), "Lab\nsession")
+    # all-day events last a day, events without an end have none
+    assert b.end - b.start == timedelta(days=1)
+    assert c.start == c.end
+
+
+def test_relcalid_wins_over_name():
+    props, _ = read_calendar(calendar("X-WR-CALNAME:Work", "X-WR-RELCALID:abc-123"))
+    assert calendar_name(props) == "abc-123"
+    assert calendar_name({}) is None
+
+
+def test_event_without_dtstart():
+    _, events = read_calendar(calendar("BEGIN:VEVENT", "UID:x", "END:VEVENT"))
+    with pytest.raises(IcsParseError):
+        list(events)
+
+
+def test_durations():
+    assert parse_duration("P1W2DT3H") == timedelta(weeks=1, days=2, hours=3)
+    assert parse_duration("-PT15M") == -timedelta(minutes=15)
+    with pytest.raises(IcsParseError):
+        parse_duration("1 hour")
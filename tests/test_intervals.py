@@ -0,0 +1,35 @@
+# tests/test_intervals.py
+"""Interval arithmetic on plain (start, end) tuples. No database needed."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from backend.intervals import at_least, intersect_all, merge, subtract, sweep  # noqa: E402
+
+
+def test_merge_coalesces_touching_and_drops_empty():
+    assert merge([(5, 7), (1, 3), (3, 4), (6, 9), (10, 10)]) == [(1, 4), (5, 9)]
+
+
+def test_subtract():
+    assert subtract([(0, 10), (20, 30)], [(2, 3), (8, 22), (25, 40)]) == [(0, 2), (3, 8), (22, 25)]
+    assert subtract([(0, 10)], []) == [(0, 10)]
+    assert subtract([(0, 10)], [(0, 10)]) == []
+
+
+def test_sweep_counts_lists_not_intervals():
+    # the first list overlaps itself: it still counts once
+    segments = list(sweep([[(0, 4), (2, 6)], [(3, 8)], [(6, 8)]]))
+    assert segments == [(0, 3, 1), (3, 8, 2)]
+
+
+def test_sweep_segments_are_not_merged():
+    # counts 1, 2, 1: three raw segments, neighbours always differ
+    assert list(sweep([[(0, 10)], [(3, 5)]])) == [(0, 3, 1), (3, 5, 2), (5, 10, 1)]
+    assert at_least([[(0, 10)], [(3, 5)]], 1) == [(0, 10)]
+
+
+def test_intersect_all():
+    assert intersect_all([[(0, 5), (7, 9)], [(3, 8)], [(0, 10)]]) == [(3, 5), (7, 8)]
+    assert intersect_all([]) == []
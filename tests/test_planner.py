@@ -0,0 +1,40 @@
+# tests/test_planner.py
+"""Earliest-deadline-first placement of the group planner. No database needed."""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from backend.planner import _assign, _improve, _shortfall  # noqa: E402
+
+
+def item(people, free, needed):
+    return {"people": set(people), "free": free, "held": 0, "needed": needed, "sessions": []}
+
+
+def planned(it):
+    return sum(b - a for a, b in it["sessions"])
+
+
+def test_earlier_deadline_gets_the_shared_slots():
+    # items are in deadline order; both want the same eight slots
+    first, second = item({1}, 0xFF, 8), item({1, 2}, 0xFF, 8)
+    _assign([first, second])
+    assert planned(first) == 8 and planned(second) == 0
+
+
+def test_disjoint_people_dont_compete():
+    a, b = item({1}, 0xFF, 8), item({2}, 0xFF, 8)
+    _assign([a, b])
+    assert planned(a) == planned(b) == 8
+
+
+def test_improvement_rescues_a_short_project():
+    # the first project could also use slots 8-15; the second only 0-7
+    first, second = item({1}, 0xFFFF, 8), item({1}, 0xFF, 8)
+    items = [first, second]
+    _assign(items)
+    assert _shortfall(items) == (8, 1)
+    improved, exhausted = _improve(items, float("inf"))
+    assert improved and not exhausted
+    assert _shortfall(items) == (0, 0)
@@ -0,0 +1,67 @@
+# tests/test_recurrence.py
+"""Lazy expansion of recurring busy events. No database needed."""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from backend.recurrence import format_exdates, occurrences, series_until  # noqa: E402
+
+
+@pytest.fixture
+def copenhagen_server(monkeypatch):
+    """Run as a server in Europe/Copenhagen, so local wall-clock times are comparable."""
+    if not hasattr(time, "tzset"):
+        pytest.skip("needs time.tzset()")
+    monkeypatch.setenv("TZ", "Europe/Copenhagen")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def series(start, rrule, tzid=None, exdates=()):
+    return SimpleNamespace(start_time=start, end_time=start + timedelta(hours=1),
+                           rrule=rrule, tzid=tzid, exdates=format_exdates(exdates))
+
+
+def test_weekly_series_keeps_its_wall_clock_time_across_dst(copenhagen_server):
+    # Copenhagen switches to summer time on 29 March 2026
+    s = series(datetime(2026, 3, 16, 10, 15), "FREQ=WEEKLY", "Europe/Copenhagen")
+    got = list(occurrences(s, datetime(2026, 3, 16), datetime(2026, 4, 7)))
+    assert [start for start, _ in got] == [datetime(2026, 3, d, 10, 15) for d in (16, 23, 30)] \
+        + [datetime(2026, 4, 6, 10, 15)]
+    assert all(end - start == timedelta(hours=1) for start, end in got)
+
+
+def test_utc_series_moves_in_local_time_across_dst(copenhagen_server):
+    s = series(datetime(2026, 3, 23, 10), "FREQ=WEEKLY", "UTC")
+    got = [start for start, _ in occurrences(s, datetime(2026, 3, 23), datetime(2026, 4, 1))]
+    assert got == [datetime(2026, 3, 23, 10), datetime(2026, 3, 30, 11)]
+
+
+def test_exdates_and_skipped_overrides():
+    start = datetime(2026, 3, 2, 9)
+    s = series(start, "FREQ=DAILY;COUNT=5", exdates=[start + timedelta(days=1)])
+    got = [d for d, _ in occurrences(s, start, start + timedelta(days=10), skip={start + timedelta(days=3)})]
+    assert got == [start, start + timedelta(days=2), start + timedelta(days=4)]
+
+
+def test_occurrence_overlapping_the_window_start_is_included():
+    s = series(datetime(2026, 3, 2, 9), "FREQ=DAILY")
+    got = list(occurrences(s, datetime(2026, 3, 3, 9, 30), datetime(2026, 3, 3, 12)))
+    assert got == [(datetime(2026, 3, 3, 9), datetime(2026, 3, 3, 10))]
+
+
+def test_series_until():
+    start = datetime.now().replace(microsecond=0)
+    assert series_until(start, start + timedelta(hours=1), "FREQ=DAILY", None) is None
+    assert series_until(start, start + timedelta(hours=1), "FREQ=DAILY;COUNT=3", None) \
+        == start + timedelta(days=2, hours=1)
+    # runs past the horizon: stored open-ended, without walking it
+    assert series_until(start, start, "FREQ=SECONDLY;COUNT=1000000000", None) is None
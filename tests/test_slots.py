@@ -0,0 +1,46 @@
+# tests/test_slots.py
+"""Slot bitmaps and the session solver. No database needed."""
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from backend.slots import horizon, runs, sessions_in, to_bits  # noqa: E402
+
+ORIGIN = datetime(2026, 3, 2)
+
+
+def at(h, m=0):
+    return datetime(2026, 3, 2, h, m)
+
+
+def test_to_bits_whole_and_partial_slots():
+    span = [(at(10, 5), at(10, 40))]
+    # 10:15-10:30 is the only slot entirely covered; 10:00-10:45 is touched
+    assert to_bits(span, ORIGIN, 96) == 1 << 41
+    assert to_bits(span, ORIGIN, 96, partial=True) == 0b111 << 40
+    # clipped to [0, n_slots)
+    assert to_bits([(datetime(2026, 3, 1, 23), at(0, 30))], ORIGIN, 1) == 1
+
+
+def test_runs():
+    assert list(runs(0)) == []
+    assert list(runs(0b1110011)) == [(0, 2), (4, 7)]
+    assert list(runs((1 << 200) - 1)) == [(0, 200)]
+
+
+def test_sessions_in_covers_hours_within_free_runs():
+    free = to_bits([(at(9), at(12)), (at(14), at(15))], ORIGIN, 96)
+    sessions = sessions_in(free, ORIGIN, 0, 96, 3.5)
+    assert sum((e - s).total_seconds() for s, e in sessions) == 3.5 * 3600
+    assert all(at(9) <= s < e <= at(12) or at(14) <= s < e <= at(15) for s, e in sessions)
+
+
+def test_sessions_in_skips_the_past_and_short_runs():
+    origin, first, n_slots = horizon(at(9, 52), at(23))
+    assert (origin, first) == (ORIGIN, 40)
+    free = to_bits([(at(9), at(11)), (at(13), at(13, 30))], origin, n_slots)
+    # 10:00-11:00 is left of the first run; the 30-minute run is too short
+    assert sessions_in(free, origin, first, n_slots, 5) == [(at(10), at(11))]
+    assert sessions_in(free, origin, first, n_slots, 0) == []